@@ -0,0 +1,135 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from api.views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+from foodgram.asgi_handler import AsyncStreamingHttpResponse
+
+
+def _call(view, request, *args, **kwargs):
+    """
+    Вызывает представление так, как его вызвал бы обработчик запроса:
+    соединения с базой в потоках пула обслуживаются так же, как
+    в начале обычного запроса, а ответ DRF отрисовывается в том же
+    потоке, чтобы сериализация тоже не попадала в цикл событий.
+    """
+    close_old_connections()
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response
+
+
+def _close(response):
+    try:
+        response.close()
+    finally:
+        close_old_connections()
+
+
+def run_in_thread(view, methods=('GET', 'HEAD')):
+    """
+    Превращает синхронное представление в асинхронное.
+
+    Под ASGI Django выполняет синхронные представления в одном общем
+    потоке процесса, и медленный запрос задерживает остальные.
+    Запросы с методами из methods выполняются в пуле потоков
+    (thread_sensitive=False), а цикл событий остаётся свободным.
+    Остальные (изменяющие данные) выполняются, как обычно,
+    в общем потоке. Для потоковых ответов см. stream_in_thread.
+    """
+
+    def call(request, *args, **kwargs):
+        try:
+            return _call(view, request, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await sync_to_async(
+            call, thread_sensitive=request.method not in methods,
+        )(request, *args, **kwargs)
+
+    return async_view
+
+
+def stream_in_thread(view):
+    """
+    Превращает синхронное представление с потоковым ответом
+    в асинхронное.
+
+    Представление и чтение его ответа выполняются в отдельном потоке
+    запроса: итератор ответа (например, с серверным курсором)
+    работает с соединением того потока, где создан. Тело отдаётся
+    по частям асинхронным итератором (AsyncStreamingHttpResponse),
+    поэтому цикл событий не блокируется, а память не растёт
+    с размером ответа.
+    """
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        executor = ThreadPoolExecutor(max_workers=1)
+        # Контекст запроса (метрики, выбор реплики) нужен и при чтении.
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+
+        def run(func, *args):
+            return loop.run_in_executor(executor, context.run, func, *args)
+
+        try:
+            response = await run(
+                partial(_call, view, request, *args, **kwargs),
+            )
+        except BaseException:
+            await run(close_old_connections)
+            executor.shutdown(wait=False)
+            raise
+        if not response.streaming:
+            await run(close_old_connections)
+            executor.shutdown(wait=False)
+            return response
+
+        async def content():
+            iterator = iter(response)
+            try:
+                while True:
+                    chunk = await run(next, iterator, None)
+                    if chunk is None:
+                        return
+                    yield chunk
+            finally:
+                await run(_close, response)
+                executor.shutdown(wait=False)
+
+        async_response = AsyncStreamingHttpResponse(
+            content(), status=response.status_code,
+        )
+        for header, value in response.items():
+            async_response[header] = value
+        return async_response
+
+    return async_view
+
+
+tag_list = run_in_thread(TagViewSet.as_view({'get': 'list'}))
+
+ingredient_list = run_in_thread(IngredientViewSet.as_view({'get': 'list'}))
+
+recipe_detail = run_in_thread(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+
+download_shopping_cart = stream_in_thread(RecipeViewSet.as_view(
+    {'get': 'download_shopping_cart'},
+    basename='recipe',
+    detail=False,
+    **RecipeViewSet.download_shopping_cart.kwargs,
+))
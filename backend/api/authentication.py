@@ -0,0 +1,126 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram.routers import primary_reads
+
+
+class LocalTokenCache:
+    """
+    Ограниченный LRU-кэш токенов в памяти процесса с временем жизни
+    записей. Записи других процессов не сбрасываются, поэтому время
+    жизни ограничивает их устаревание.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            token, expires = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return token
+
+    def set(self, key, token):
+        with self._lock:
+            self._items[key] = (token, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+local_tokens = LocalTokenCache(
+    size=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.AUTH_TOKEN_CACHE_TTL,
+)
+
+
+def get_cache_key(token_key):
+    return f'auth-token:{hashlib.sha256(token_key.encode()).hexdigest()}'
+
+
+def invalidate_token(token_key):
+    """Удаляет токен из локального и общего кэша."""
+    cache_key = get_cache_key(token_key)
+    local_tokens.delete(cache_key)
+    cache.delete(cache_key)
+
+
+def invalidate_user_tokens(user_ids):
+    """
+    Сбрасывает кэш всех токенов пользователей user_ids.
+
+    Сохранение пользователя делает это само (см. api.signals), а после
+    массовых изменений в обход save() - например,
+    User.objects.filter(...).update(is_active=False) - функцию нужно
+    вызвать явно, иначе кэш продолжит пропускать пользователей
+    до истечения AUTH_TOKEN_SHARED_CACHE_TTL.
+    """
+    with primary_reads():
+        keys = list(Token.objects.filter(user_id__in=user_ids).values_list(
+            'key',
+            flat=True,
+        ))
+    for key in keys:
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену без запроса к базе на каждый запрос.
+
+    Токен вместе с пользователем ищется сначала в памяти процесса,
+    затем в общем кэше и только потом в базе. Записи сбрасываются
+    при удалении токена (выход), сохранении пользователя (смена
+    пароля, деактивация) - см. api.signals; после массовых изменений
+    пользователей нужно вызвать invalidate_user_tokens(). Токен
+    читается из основной базы: реплика может ещё не знать о только
+    что выданном токене или о деактивации.
+
+    Каждый запрос получает свою копию токена и пользователя, так что
+    изменения request.user не видны другим запросам и потокам.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_cache_key(key)
+        token = local_tokens.get(cache_key)
+        if token is None:
+            token = cache.get(cache_key)
+            if token is None:
+                with primary_reads():
+                    token = super().authenticate_credentials(key)[1]
+                cache.set(
+                    cache_key,
+                    token,
+                    settings.AUTH_TOKEN_SHARED_CACHE_TTL,
+                )
+            local_tokens.set(cache_key, token)
+        token = copy.deepcopy(token)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'),
+            )
+        return token.user, token
@@ -0,0 +1,103 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+from app.checks import PROCESS_LOCAL_CACHES
+from app.versions import get_version, get_versions
+
+
+class ResponseCache:
+    """
+    Кэш данных ответов со списками объектов.
+
+    В ключ записи входят текущие версии её тегов (см. app.versions):
+    их изменение (например, появление нового рецепта) делает все
+    старые записи недостижимыми. Кроме того, запись хранит версии
+    объектов item_name, попавших в ответ, и считается устаревшей, если
+    изменился хотя бы один из них, — остальные записи не затрагиваются.
+    Старые записи вытесняются по таймауту.
+    """
+
+    def __init__(self, prefix, tags, item_name, timeout):
+        self.prefix = prefix
+        self.tags = tags
+        self.item_name = item_name
+        self.timeout = timeout
+
+    def make_key(self, request):
+        """
+        Строит ключ по хосту, пути и нормализованной строке запроса:
+        порядок параметров и их значений не важен.
+        """
+        query = urlencode(sorted(
+            (key, value)
+            for key in request.query_params
+            for value in request.query_params.getlist(key)
+        ))
+        versions = ':'.join(str(get_version(tag)) for tag in self.tags)
+        raw_key = f'{request.get_host()}{request.path}?{query}#{versions}'
+        return f'{self.prefix}:{hashlib.md5(raw_key.encode()).hexdigest()}'
+
+    def get(self, key):
+        entry = cache.get(key)
+        if entry is not None:
+            data, versions = entry
+            if get_versions(self.item_name, versions) != versions:
+                entry = None
+        self._count('hits' if entry is not None else 'misses')
+        return data if entry is not None else None
+
+    def get_stamp(self):
+        """
+        Возвращает счётчик изменений объектов item_name. Его нужно
+        прочитать до построения ответа и передать в set().
+        """
+        return get_version(f'{self.item_name}-changes')
+
+    def set(self, key, data, stamp):
+        """
+        Сохраняет данные вместе с версиями попавших в них объектов.
+
+        Если за время построения ответа объекты менялись, версии,
+        прочитанные сейчас, могут оказаться новее данных, поэтому
+        такой ответ не сохраняется.
+        """
+        items = data['results'] if isinstance(data, dict) else data
+        versions = get_versions(self.item_name, [item['id'] for item in items])
+        if self.get_stamp() != stamp:
+            return
+        cache.set(key, (data, versions), self.timeout)
+
+    def _count(self, name):
+        key = f'{self.prefix}:{name}'
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+    def stats(self):
+        """Возвращает счётчики попаданий и промахов."""
+        return {
+            name: cache.get(f'{self.prefix}:{name}', 0)
+            for name in ('hits', 'misses')
+        }
+
+    def is_shared(self):
+        """
+        Общие ли счётчики и записи для всех воркеров. В кэше процесса
+        (LocMemCache) каждый воркер видит только свои.
+        """
+        return settings.CACHES['default']['BACKEND'] not in (
+            PROCESS_LOCAL_CACHES
+        )
+
+
+recipe_list_cache = ResponseCache(
+    prefix='recipe-list',
+    tags=('recipe', 'tag', 'ingredient'),
+    item_name='recipe',
+    timeout=settings.RECIPE_LIST_CACHE_TIMEOUT,
+)
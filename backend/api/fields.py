@@ -0,0 +1,59 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+def get_objects_in_bulk(queryset, values):
+    """
+    Загружает объекты по списку первичных ключей одним запросом IN
+    и возвращает их в порядке ключей. Если каких-то объектов нет,
+    все отсутствующие ключи перечисляются в одной ошибке.
+    """
+    pk_field = queryset.model._meta.pk
+    pks, invalid = [], []
+    for value in values:
+        try:
+            if isinstance(value, bool):
+                raise DjangoValidationError('')
+            pks.append(pk_field.to_python(value))
+        except DjangoValidationError:
+            invalid.append(value)
+    if invalid:
+        raise serializers.ValidationError(
+            f'Некорректные id: {", ".join(map(str, invalid))}.'
+        )
+    objects = queryset.in_bulk(set(pks))
+    missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+    if missing:
+        raise serializers.ValidationError(
+            f'Объекты с id {", ".join(map(str, missing))} не существуют.'
+        )
+    return [objects[pk] for pk in pks]
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список связанных объектов, загружаемых одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        data = list(data)
+        if not self.allow_empty and not data:
+            self.fail('empty')
+        return get_objects_in_bulk(self.child_relation.get_queryset(), data)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который при many=True проверяет все
+    переданные id одним запросом вместо запроса на каждый id.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
@@ -1,21 +1,28 @@
 import django_filters
+from django.db.models import Exists, OuterRef
 
-from rest_framework.filters import SearchFilter
+from app.models import Recipe, TagForRecipe
+from app.search import search_recipes
 
-from app.models import Recipe, Tag
 
-
-class IngredientSearchFilter(SearchFilter):
+class MultipleValueField(django_filters.fields.MultipleChoiceField):
     """
-    Фильтр для поиска ингредиентов по названию.
+    Список значений параметра без проверки по заранее заданным
+    вариантам, чтобы не загружать их из базы на каждый запрос.
     """
-    search_param = "name"
+
+    def valid_value(self, value):
+        return True
+
+
+class MultipleValueFilter(django_filters.MultipleChoiceFilter):
+    field_class = MultipleValueField
 
 
 class RecipeFilter(django_filters.FilterSet):
     """
     Фильтр для рецептов, позволяющий фильтровать
-    по избранным, корзине, тегам и автору.
+    по избранным, корзине, тегам, автору и тексту.
     """
 
     is_favorited = django_filters.NumberFilter(
@@ -30,14 +37,61 @@ class RecipeFilter(django_filters.FilterSet):
         help_text='Показать только рецепты в корзине (1) или все (0).'
     )
 
-    tags = django_filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = MultipleValueFilter(
+        method='tags_filter',
         label='Теги',
         help_text='Фильтр по тегам. Выберите один или несколько тегов.'
     )
 
+    tags_mode = django_filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='tags_mode_filter',
+        label='Режим фильтра по тегам',
+        help_text='any - рецепт с любым из тегов (по умолчанию), '
+                  'all - рецепт со всеми тегами.'
+    )
+
+    search = django_filters.CharFilter(
+        method='search_filter',
+        label='Поиск',
+        help_text=(
+            'Поиск по названию, ингредиентам и описанию. '
+            'Результаты упорядочены по релевантности.'
+        ),
+    )
+
+    def search_filter(self, queryset, name, value):
+        """
+        Полнотекстовый поиск рецептов с ранжированием.
+        """
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value.strip())
+
+    def tags_filter(self, queryset, name, value):
+        """
+        Фильтр по тегам через EXISTS: рецепт не дублируется при
+        совпадении нескольких тегов, и DISTINCT не нужен.
+        """
+        slugs = set(value)
+        if not slugs:
+            return queryset
+        if self.form.cleaned_data.get('tags_mode') == 'all':
+            for slug in slugs:
+                queryset = queryset.filter(Exists(TagForRecipe.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tag__slug=slug,
+                )))
+            return queryset
+        return queryset.filter(Exists(TagForRecipe.objects.filter(
+            recipe=OuterRef('pk'),
+            tag__slug__in=slugs,
+        )))
+
+    def tags_mode_filter(self, queryset, name, value):
+        """Режим применяется в tags_filter."""
+        return queryset
+
     def favorite_filter(self, queryset, name, value):
         """
         Фильтр для избранных рецептов.
@@ -58,4 +112,7 @@ class RecipeFilter(django_filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags',
+            'tags_mode', 'search',
+        )
@@ -0,0 +1,91 @@
+import heapq
+import threading
+from bisect import bisect_left
+
+from app.models import Ingredient
+from app.utils import normalize
+from app.versions import get_version
+
+from foodgram.routers import primary_reads
+
+# Символ, который больше любого другого: ключи с префиксом p лежат
+# в отсортированном списке на отрезке [p, p + MAX_CHAR).
+MAX_CHAR = '\U0010ffff'
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения по префиксу.
+
+    Хранит отсортированный список нормализованных названий и ищет
+    по нему бинарным поиском, не обращаясь к базе данных. Индекс строится
+    при первом запросе и перестраивается, когда меняется версия
+    справочника ингредиентов (см. app.signals).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = ((), ())
+
+    def _build(self, version):
+        with primary_reads():
+            rows = list(Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit',
+            ))
+        entries = sorted(
+            (normalize(name), pk, name, measurement_unit)
+            for pk, name, measurement_unit in rows
+        )
+        keys = tuple(entry[0] for entry in entries)
+        items = tuple(
+            Ingredient(id=pk, name=name, measurement_unit=measurement_unit)
+            for _, pk, name, measurement_unit in entries
+        )
+        self._data = (keys, items)
+        self._version = version
+
+    def _get_data(self):
+        version = get_version('ingredient')
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+        return self._data
+
+    def search(self, query, limit):
+        """
+        Возвращает не больше limit ингредиентов, название которых
+        начинается с query. Точное совпадение идёт первым,
+        затем более короткие названия, затем по алфавиту.
+
+        Если таких меньше limit, список дополняется названиями,
+        содержащими query в середине: сначала с более ранним
+        вхождением, затем более короткие, затем по алфавиту. Только
+        в этом случае индекс просматривается целиком.
+        """
+        keys, items = self._get_data()
+        prefix = normalize(query)
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + MAX_CHAR, start)
+        best = heapq.nsmallest(
+            limit,
+            range(start, end),
+            key=lambda i: (keys[i] != prefix, len(keys[i]), keys[i]),
+        )
+        if len(best) < limit and prefix:
+            positions = (
+                (keys[i].find(prefix, 1), len(keys[i]), keys[i], i)
+                for i in range(len(keys))
+                if not start <= i < end
+            )
+            best += [
+                i for *_, i in heapq.nsmallest(
+                    limit - len(best),
+                    (entry for entry in positions if entry[0] > 0),
+                )
+            ]
+        return [items[i] for i in best]
+
+
+ingredient_index = IngredientIndex()
@@ -1,4 +1,12 @@
-from rest_framework import mixins, viewsets
+import hashlib
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+
+from rest_framework import mixins, status, viewsets
+from rest_framework.response import Response
+
+from foodgram.routers import primary_reads
 
 
 class ListRetrieveCreateViewSet(
@@ -8,3 +16,67 @@ class ListRetrieveCreateViewSet(
     viewsets.GenericViewSet,
 ):
     pass
+
+
+class ConditionalGetMixin:
+    """
+    Поддержка условных GET-запросов для list и retrieve.
+
+    ETag строится из версий ресурсов (см. app.versions) до обращения
+    к базе данных, поэтому при совпадении If-None-Match ответ 304
+    отдаётся без запросов на чтение данных и без сериализации.
+    Полный ответ с ETag читается с основной базы (см. primary_reads).
+    """
+
+    # Заголовки запроса, от которых зависит содержимое ответа.
+    etag_vary_headers = ()
+
+    def get_etag_parts(self):
+        """
+        Возвращает значения, из которых строится ETag,
+        или None, если условный запрос не поддерживается.
+        """
+        return None
+
+    def get_etag(self):
+        parts = self.get_etag_parts()
+        if parts is None:
+            return None
+        value = repr((self.request.get_full_path(), *parts))
+        return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag()
+        if etag is None:
+            return handler(request, *args, **kwargs)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            with primary_reads():
+                response = handler(request, *args, **kwargs)
+            # «*» совпадает с любым ETag, но только если ресурс
+            # существует, поэтому сначала выполняется сам запрос.
+            if (
+                '*' in if_none_match
+                and response.status_code == status.HTTP_200_OK
+            ):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        if response.status_code in (
+            status.HTTP_200_OK,
+            status.HTTP_304_NOT_MODIFIED,
+        ):
+            response['ETag'] = etag
+            if self.etag_vary_headers:
+                patch_vary_headers(response, self.etag_vary_headers)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs,
+        )
@@ -1,5 +1,52 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+class LimitCursorPagination(CursorPagination):
+    """
+    Пагинация по курсору: следующая страница выбирается условием
+    по первичному ключу, без COUNT(*) и OFFSET.
+    """
+
+    page_size_query_param = 'limit'
+    ordering = '-pk'
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
 
 
 class LimitPageNumberPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с параметром limit.
+
+    Если в запросе есть параметр cursor (для первой страницы — пустой),
+    включается пагинация по курсору (LimitCursorPagination) с той же
+    формой ответа, но count в ней равен null. Курсор задаёт свой
+    порядок (-pk), поэтому сортировка поиска по релевантности
+    в этом режиме не действует.
+    """
+
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_pagination_class = LimitCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view,
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,66 @@
+import csv
+from abc import ABCMeta, abstractmethod
+
+from rest_framework import renderers
+
+
+class ShoppingListRenderer(renderers.BaseRenderer, metaclass=ABCMeta):
+    """
+    Базовый рендерер списка покупок.
+
+    Строки списка отдаются потоком через render_rows(), а render()
+    используется только для сообщений об ошибках.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data)
+
+    @abstractmethod
+    def render_rows(self, rows):
+        """
+        Принимает итератор словарей с ключами name, measurement_unit
+        и amount и по одной возвращает строки файла.
+        """
+
+
+class PlainTextShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в виде простого текста."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render_rows(self, rows):
+        for row in rows:
+            yield (
+                f'{row["name"]} '
+                f'({row["measurement_unit"]}) - '
+                f'{row["amount"]}\n'
+            )
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render_rows(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')
+        )
+        for row in rows:
+            yield writer.writerow(
+                (row['name'], row['measurement_unit'], row['amount'])
+            )
@@ -1,9 +1,18 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
 
 from drf_extra_fields.fields import Base64ImageField
 
+from api.fields import BulkPrimaryKeyRelatedField, get_objects_in_bulk
+from app import shopping_list
+from app.images import (
+    IMAGE_FORMATS,
+    media_url,
+    schedule_image_cleanup,
+    schedule_recipe_image,
+)
 from app.models import (
     Favourite,
     Follow,
@@ -14,6 +23,8 @@ from app.models import (
     Tag,
     TagForRecipe,
 )
+from app.search import update_search_vectors
+from app.versions import bump_recipe_version
 
 User = get_user_model()
 
@@ -76,7 +87,8 @@ class CreateUserSerializer(serializers.ModelSerializer):
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для ингредиента в рецепте."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    # Ингредиенты проверяются пакетом в CreateRecipeSerializer
+    id = serializers.IntegerField(source='ingredient_id', min_value=1)
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
@@ -96,12 +108,11 @@ class RecipeSerializer(serializers.ModelSerializer):
         source='ingredient_in_recipes',
         many=True,
     )
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -113,32 +124,44 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_favorited',
             'is_in_shopping_cart',
             'is_subscribed',
+            'favorites_count',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
-    def get_is_favorited(self, obj):
-        return obj.id in self.context['favorites']
-
-    def get_is_in_shopping_cart(self, obj):
-        return obj.id in self.context['shopping_cart']
-
     def get_image(self, obj):
         """Метод для представления изображения."""
+        return media_url(obj.image.name)
 
-        image_path = obj.image.path
-        new_path = image_path.replace('/app', '')
-        return new_path
+    def get_image_variants(self, obj):
+        """
+        Ссылки на уменьшенные копии изображения по размерам и форматам.
+        Пока копии не готовы, вместо них отдаётся исходное изображение.
+        """
+        if obj.image_status == Recipe.ImageStatus.READY:
+            return {
+                variant: {
+                    image_format: media_url(name)
+                    for image_format, name in formats.items()
+                }
+                for variant, formats in obj.image_variants.items()
+            }
+        original = media_url(obj.image.name)
+        return {
+            variant: {image_format: original for image_format in IMAGE_FORMATS}
+            for variant in settings.RECIPE_IMAGE_VARIANTS
+        }
 
     def get_is_subscribed(self, obj):
         return obj.author.id in self.context['subscriptions']
 
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
-    ingredients = IngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    ingredients = IngredientInRecipeSerializer(many=True)
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True
     )
@@ -155,15 +178,36 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             'cooking_time',
         )
 
+    def validate_ingredients(self, ingredients):
+        """
+        Проверяет все ингредиенты рецепта одним запросом
+        и подставляет найденные объекты.
+        """
+        ids = [obj.pop('ingredient_id') for obj in ingredients]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться.'
+            )
+        for obj, ingredient in zip(ingredients, get_objects_in_bulk(
+            Ingredient.objects.all(),
+            ids,
+        )):
+            obj['ingredient'] = ingredient
+        return ingredients
+
+    def validate_tags(self, tags):
+        if len(set(tags)) != len(tags):
+            raise serializers.ValidationError('Теги не должны повторяться.')
+        return tags
+
     def create_ingredient(self, ingredients, recipe):
         ingredient_list = []
         for obj in ingredients:
-            ingredient, amount = obj
             ingredient_list.append(
                 IngredientInRecipe(
                     recipe=recipe,
-                    ingredient=ingredient,
-                    amount=amount,
+                    ingredient=obj['ingredient'],
+                    amount=obj['amount'],
                 )
             )
         IngredientInRecipe.objects.bulk_create(ingredient_list)
@@ -182,23 +226,119 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=user, **validated_data)
         self.create_ingredient(ingredients, recipe)
         self.create_tag(tags, recipe)
+        update_search_vectors((recipe.pk,))
+        schedule_recipe_image(recipe.pk)
         return recipe
 
+    def update_tags(self, recipe, tags):
+        """
+        Приводит теги рецепта к переданным, удаляя и добавляя
+        только отличающиеся. Возвращает True, если теги изменились.
+        """
+        current = set(
+            TagForRecipe.objects.filter(recipe=recipe).values_list(
+                'tag_id',
+                flat=True,
+            )
+        )
+        new = {tag.pk for tag in tags}
+        if current - new:
+            TagForRecipe.objects.filter(
+                recipe=recipe,
+                tag_id__in=current - new,
+            ).delete()
+        TagForRecipe.objects.bulk_create(
+            TagForRecipe(recipe=recipe, tag_id=tag_id)
+            for tag_id in new - current
+        )
+        return current != new
+
+    def update_ingredients(self, recipe, ingredients):
+        """
+        Приводит состав рецепта к переданному: удаляет и добавляет
+        только отличающиеся ингредиенты, а количество меняет через
+        bulk_update. Возвращает True, если состав изменился.
+        """
+        shopping_list.lock_recipes((recipe.pk,))
+        current = {
+            item.ingredient_id: item
+            for item in IngredientInRecipe.objects.filter(recipe=recipe)
+        }
+        old = {
+            ingredient_id: item.amount
+            for ingredient_id, item in current.items()
+        }
+        new = {obj['ingredient'].pk: obj['amount'] for obj in ingredients}
+        to_delete = [
+            item.pk for ingredient_id, item in current.items()
+            if ingredient_id not in new
+        ]
+        to_create, to_update = [], []
+        for ingredient_id, amount in new.items():
+            item = current.get(ingredient_id)
+            if item is None:
+                to_create.append(IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                ))
+            elif item.amount != amount:
+                item.amount = amount
+                to_update.append(item)
+        if to_delete:
+            IngredientInRecipe.objects.filter(pk__in=to_delete).delete()
+        IngredientInRecipe.objects.bulk_create(to_create)
+        IngredientInRecipe.objects.bulk_update(to_update, ('amount',))
+        shopping_list.change_recipe(recipe.pk, old, new)
+        return old != new
+
     @transaction.atomic
     def update(self, instance, validated_data):
+        changed = False
         if 'tags' in validated_data:
-            tags = validated_data.pop('tags')
-            instance.tags.clear()
-            self.create_tag(tags, instance)
+            changed |= self.update_tags(instance, validated_data.pop('tags'))
 
         if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self.create_ingredient(ingredients, instance)
+            ingredients_changed = self.update_ingredients(
+                instance,
+                validated_data.pop('ingredients'),
+            )
+            changed |= ingredients_changed
+        else:
+            ingredients_changed = False
+
+        if changed:
+            # bulk_create и bulk_update не отправляют сигналов, а save()
+            # ниже либо не вызывается, либо сохраняет поля, которые
+            # не влияют на состав списков рецептов (см. app.signals).
+            bump_recipe_version(instance.pk)
+
+        old_image = instance.image.name
+        if 'image' in validated_data:
+            instance.image_status = Recipe.ImageStatus.PENDING
+            instance.image_variants = {}
+            schedule_recipe_image(instance.pk)
+            validated_data.update(
+                image_status=instance.image_status,
+                image_variants=instance.image_variants,
+            )
 
-        return super().update(instance, validated_data)
+        # Счётчики меняются отдельными UPDATE, поэтому сохраняются
+        # только изменённые поля, чтобы не затереть их старыми значениями.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if validated_data:
+            instance.save(update_fields=validated_data)
+        if instance.image.name != old_image:
+            schedule_image_cleanup(old_image)
+        if ingredients_changed or validated_data.keys() & {'name', 'text'}:
+            update_search_vectors((instance.pk,))
+        return instance
 
     def to_representation(self, instance):
+        instance = Recipe.objects.with_related().with_user_flags(
+            self.context['request'].user,
+        ).get(pk=instance.pk)
         serializer = RecipeSerializer(instance, context=self.context)
         return serializer.data
 
@@ -206,16 +346,25 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 class FavouriteAndShoppingCartSerializer(serializers.ModelSerializer):
     """Сериализатор для избранного и корзины."""
 
+    image = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def get_image(self, obj):
+        return media_url(obj.image.name)
+
 
 class FollowSerializer(serializers.ModelSerializer):
     """Сериализатор для управления подписками."""
 
-    recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes = FavouriteAndShoppingCartSerializer(
+        source='limited_recipes',
+        many=True,
+        read_only=True,
+    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -229,18 +378,6 @@ class FollowSerializer(serializers.ModelSerializer):
             'recipes_count',
         )
 
-    def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        recipes = Recipe.objects.filter(author=obj)
-        if recipes_limit:
-            recipes = Recipe.objects.filter(author=obj)[:int(recipes_limit)]
-        serializer = FavouriteAndShoppingCartSerializer(recipes, many=True)
-        return serializer.data
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
     def validate_following(self, following):
         user = self.context['request'].user
 
@@ -276,3 +413,17 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingCart
         fields = ('user', 'recipe')
+
+
+class RecipeListBatchSerializer(serializers.Serializer):
+    """
+    Сериализатор пакетного изменения избранного или корзины.
+    """
+
+    list = serializers.ChoiceField(choices=('favorite', 'shopping_cart'))
+    action = serializers.ChoiceField(choices=('add', 'remove'))
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BATCH_MAX,
+    )
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_token, invalidate_user_tokens
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    """Сбрасывает кэш удалённого токена, например при выходе."""
+    transaction.on_commit(lambda: invalidate_token(instance.key))
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, update_fields=None, **kwargs):
+    """
+    Сбрасывает кэш токенов пользователя при любом его сохранении:
+    в кэше хранится объект пользователя, а смена пароля или
+    деактивация должны действовать сразу. Обновление last_login
+    при входе пропускается.
+    """
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: invalidate_user_tokens([instance.pk]))
@@ -0,0 +1,112 @@
+import threading
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.core.signals import request_started
+from django.db import close_old_connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import path
+
+from api.async_views import run_in_thread, stream_in_thread
+
+from foodgram.asgi_handler import ASGIHandler
+
+
+def thread_view(request):
+    return HttpResponse(str(threading.get_ident()))
+
+
+def streaming_view(request):
+    def content():
+        for _ in range(3):
+            yield f'{threading.get_ident()}\n'
+
+    response = StreamingHttpResponse(content(), content_type='text/plain')
+    response['Content-Disposition'] = 'attachment; filename="list.txt"'
+    response['X-View-Thread'] = str(threading.get_ident())
+    return response
+
+
+urlpatterns = [
+    path('stream/', stream_in_thread(streaming_view)),
+]
+
+
+class Handler(ASGIHandler):
+    urlconf = __name__
+
+
+class RunInThreadTests(SimpleTestCase):
+
+    def call(self, view, method):
+        request = getattr(RequestFactory(), method.lower())('/')
+        return async_to_sync(run_in_thread(view))(request)
+
+    def test_read_requests_run_in_pool(self):
+        response = self.call(thread_view, 'GET')
+        self.assertNotEqual(
+            int(response.content), threading.get_ident(),
+        )
+
+    def test_write_requests_run_in_shared_thread(self):
+        # Общий поток thread_sensitive-вызовов внутри async_to_sync -
+        # это вызывающий поток.
+        for method in ('POST', 'PATCH', 'DELETE'):
+            with self.subTest(method=method):
+                response = self.call(thread_view, method)
+                self.assertEqual(
+                    int(response.content), threading.get_ident(),
+                )
+
+
+class StreamInThreadTests(SimpleTestCase):
+
+    def setUp(self):
+        request_started.disconnect(close_old_connections)
+        self.addCleanup(request_started.connect, close_old_connections)
+
+    async def request(self, path):
+        communicator = ApplicationCommunicator(Handler(), {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'scheme': 'http',
+            'headers': [(b'host', b'testserver')],
+            'server': ('testserver', 80),
+            'client': ('127.0.0.1', 1000),
+        })
+        await communicator.send_input({'type': 'http.request'})
+        messages = []
+        while True:
+            message = await communicator.receive_output(5)
+            messages.append(message)
+            if (
+                message['type'] == 'http.response.body'
+                and not message.get('more_body')
+            ):
+                break
+        await communicator.wait(5)
+        return messages
+
+    def test_streamed_in_view_thread(self):
+        start, *body, end = async_to_sync(self.request)('/stream/')
+        self.assertEqual(start['status'], 200)
+        headers = dict(start['headers'])
+        self.assertEqual(
+            headers[b'Content-Disposition'],
+            b'attachment; filename="list.txt"',
+        )
+        # Тело приходит частями, а не одним собранным ответом.
+        self.assertEqual(len(body), 3)
+        self.assertTrue(all(message['more_body'] for message in body))
+        self.assertEqual(end, {'type': 'http.response.body'})
+        view_thread = headers[b'X-View-Thread'].decode()
+        self.assertNotEqual(view_thread, str(threading.get_ident()))
+        for message in body:
+            self.assertEqual(message['body'].decode(), f'{view_thread}\n')
@@ -0,0 +1,92 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from api.authentication import (
+    CachedTokenAuthentication,
+    get_cache_key,
+    invalidate_token,
+    invalidate_user_tokens,
+    local_tokens,
+)
+from api.tests.utils import create_user, get_client
+from users.models import User
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Аутентификация по токену с кэшем."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        invalidate_token(self.token.key)
+        self.authentication = CachedTokenAuthentication()
+
+    def authenticate(self):
+        request = RequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+        return self.authentication.authenticate(request)
+
+    def test_cached_hits_skip_database(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user, self.user)
+
+    def test_each_request_gets_own_user(self):
+        first, first_token = self.authenticate()
+        first.first_name = 'Другое'
+        second, second_token = self.authenticate()
+        self.assertIsNot(first, second)
+        self.assertIsNot(first_token, second_token)
+        self.assertEqual(second.first_name, self.user.first_name)
+
+    def test_inactive_cached_user_is_rejected(self):
+        self.authenticate()
+        cache_key = get_cache_key(self.token.key)
+        token = cache.get(cache_key)
+        token.user.is_active = False
+        local_tokens.set(cache_key, token)
+        with self.assertNumQueries(0):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                self.authenticate()
+
+    def test_save_invalidates_tokens(self):
+        client = get_client(self.user)
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_bulk_update_needs_explicit_invalidation(self):
+        client = get_client(self.user)
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        invalidate_user_tokens([self.user.pk])
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_cached_user_save_keeps_counters(self):
+        client = get_client(self.user)
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        follower = get_client(create_user(1))
+        response = follower.post(f'/api/users/{self.user.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.followers_count, 1)
+        response = client.post('/api/users/set_password/', {
+            'current_password': 'password-12345',
+            'new_password': 'new-password-12345',
+        })
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.followers_count, 1)
+        self.assertTrue(self.user.check_password('new-password-12345'))
@@ -0,0 +1,38 @@
+import random
+from io import StringIO
+
+from django.core.cache import cache
+from django.test import TransactionTestCase
+
+from app.management.commands.benchmark_api import (
+    BUDGETS,
+    Command,
+    get_query_budget,
+)
+
+
+class QueryBudgetTests(TransactionTestCase):
+    """
+    Бюджеты числа SQL-запросов команды benchmark_api на небольшом
+    наборе данных. TransactionTestCase, чтобы обработчики on_commit
+    выполнялись, как в работающем приложении, а безопасные запросы
+    читали с реплик, если они настроены.
+    """
+
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_query_budgets(self):
+        command = Command(stdout=StringIO())
+        command.random = random.Random(0)
+        command.seed({'users': 12, 'recipes': 40, 'ingredients': 100})
+        results = command.run_scenarios(iterations=10)
+        self.assertEqual(set(results), set(BUDGETS))
+        # Анонимный список без кэша должен действительно читать базу.
+        self.assertGreater(min(results['recipes:list:anonymous'][1]), 0)
+        for name, (_, queries) in results.items():
+            with self.subTest(scenario=name):
+                self.assertLessEqual(max(queries), get_query_budget(name))
@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.cache import recipe_list_cache
+from api.tests.utils import (
+    create_ingredients,
+    create_recipe,
+    create_tags,
+    create_user,
+    get_client,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class RecipeListCacheTests(TestCase):
+    """Кэш списка рецептов для анонимных пользователей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.tags = create_tags(2)
+        cls.ingredients = create_ingredients(2)
+        cls.first = create_recipe(
+            cls.author, cls.tags[:1], cls.ingredients, name='А',
+        )
+        cls.second = create_recipe(
+            cls.author, cls.tags[1:], cls.ingredients, name='Б',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = get_client()
+        self.author_client = get_client(self.author)
+
+    def get_first_page(self):
+        return self.anonymous.get('/api/recipes/', {'limit': 1})
+
+    def patch(self, recipe, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.author_client.patch(
+                f'/api/recipes/{recipe.pk}/', data, format='json',
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_repeated_request_is_served_from_cache(self):
+        self.assertEqual(self.get_first_page()['X-Cache'], 'MISS')
+        self.assertEqual(self.get_first_page()['X-Cache'], 'HIT')
+
+    def test_change_of_listed_recipe_invalidates_entry(self):
+        self.get_first_page()
+        self.patch(self.first, {'cooking_time': 42})
+        response = self.get_first_page()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['cooking_time'], 42)
+
+    def test_change_of_other_recipe_keeps_entry(self):
+        self.get_first_page()
+        self.patch(self.second, {'cooking_time': 42})
+        self.assertEqual(self.get_first_page()['X-Cache'], 'HIT')
+
+    def test_new_recipe_invalidates_entry(self):
+        self.get_first_page()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.author, self.tags, self.ingredients, name='0')
+        response = self.get_first_page()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['name'], '0')
+
+    def test_tag_change_invalidates_entry(self):
+        self.anonymous.get('/api/recipes/', {'tags': self.tags[1].slug})
+        self.patch(self.first, {'tags': [tag.pk for tag in self.tags]})
+        response = self.anonymous.get(
+            '/api/recipes/', {'tags': self.tags[1].slug},
+        )
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_response_built_during_change_is_not_stored(self):
+        stamp = recipe_list_cache.get_stamp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.save(update_fields=('cooking_time',))
+        recipe_list_cache.set(
+            'key', {'results': [{'id': self.first.pk}]}, stamp,
+        )
+        self.assertIsNone(cache.get('key'))
+
+    def test_tag_change_with_other_fields_invalidates_entry(self):
+        self.anonymous.get('/api/recipes/', {'tags': self.tags[1].slug})
+        self.patch(self.first, {
+            'tags': [tag.pk for tag in self.tags],
+            'cooking_time': 15,
+        })
+        response = self.anonymous.get(
+            '/api/recipes/', {'tags': self.tags[1].slug},
+        )
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_author_profile_change_invalidates_entry(self):
+        self.get_first_page()
+        author = type(self.author).objects.get(pk=self.author.pk)
+        author.first_name = 'Другое'
+        with self.captureOnCommitCallbacks(execute=True):
+            author.save()
+        response = self.get_first_page()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(
+            response.data['results'][0]['author']['first_name'], 'Другое',
+        )
+
+    def test_other_user_changes_keep_entry(self):
+        self.get_first_page()
+        author = type(self.author).objects.get(pk=self.author.pk)
+        author.set_password('password-67890')
+        other = create_user(1)
+        other.first_name = 'Другое'
+        with self.captureOnCommitCallbacks(execute=True):
+            author.save()
+            other.save()
+        self.assertEqual(self.get_first_page()['X-Cache'], 'HIT')
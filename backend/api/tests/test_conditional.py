@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from app.versions import bump_version, get_version
+from api.tests.utils import (
+    create_ingredients,
+    create_recipe,
+    create_tags,
+    create_user,
+    get_client,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ConditionalGetTests(TestCase):
+    """Условные GET-запросы к рецепту."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.recipe = create_recipe(
+            cls.user, create_tags(1), create_ingredients(2),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = get_client()
+
+    def test_etag_match_returns_not_modified(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_any_etag_for_existing_recipe_returns_not_modified(self):
+        response = self.client.get(
+            f'/api/recipes/{self.recipe.pk}/', HTTP_IF_NONE_MATCH='*',
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_any_etag_for_missing_recipe_returns_not_found(self):
+        response = self.client.get(
+            f'/api/recipes/{self.recipe.pk + 1000}/', HTTP_IF_NONE_MATCH='*',
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_version_changes_only_after_commit(self):
+        version = get_version('recipe', self.recipe.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version('recipe', self.recipe.pk)
+            self.assertEqual(get_version('recipe', self.recipe.pk), version)
+        self.assertNotEqual(get_version('recipe', self.recipe.pk), version)
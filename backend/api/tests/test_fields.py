@@ -0,0 +1,70 @@
+from django.test import TestCase
+
+from rest_framework import serializers
+
+from api.fields import BulkPrimaryKeyRelatedField, get_objects_in_bulk
+from api.tests.utils import create_tags
+from app.models import Tag
+
+
+class TagsSerializer(serializers.Serializer):
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
+
+
+class BulkFieldsTests(TestCase):
+    """Загрузка связанных объектов одним запросом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(3)
+        cls.missing = [tag.pk + 100 for tag in cls.tags[:2]]
+
+    def test_get_objects_in_bulk(self):
+        pks = [self.tags[2].pk, self.tags[0].pk, self.tags[2].pk]
+        with self.assertNumQueries(1) as context:
+            objects = get_objects_in_bulk(Tag.objects.all(), map(str, pks))
+        self.assertIn(' IN ', context.captured_queries[0]['sql'])
+        self.assertEqual([tag.pk for tag in objects], pks)
+
+    def test_get_objects_in_bulk_lists_every_missing_id(self):
+        values = [self.missing[0], self.tags[0].pk, self.missing[1]]
+        with self.assertNumQueries(1):
+            with self.assertRaises(serializers.ValidationError) as context:
+                get_objects_in_bulk(Tag.objects.all(), values)
+        self.assertEqual(context.exception.detail, [
+            f'Объекты с id {self.missing[0]}, {self.missing[1]} '
+            f'не существуют.',
+        ])
+
+    def test_get_objects_in_bulk_invalid_ids(self):
+        with self.assertNumQueries(0):
+            with self.assertRaises(serializers.ValidationError) as context:
+                get_objects_in_bulk(Tag.objects.all(), ['a', True, 1])
+        self.assertEqual(context.exception.detail, [
+            'Некорректные id: a, True.',
+        ])
+
+    def test_field(self):
+        pks = [tag.pk for tag in self.tags]
+        serializer = TagsSerializer(data={'tags': pks})
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['tags'], self.tags)
+
+    def test_field_lists_every_missing_id(self):
+        serializer = TagsSerializer(
+            data={'tags': [self.tags[0].pk, *self.missing]},
+        )
+        with self.assertNumQueries(1):
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['tags'], [
+            f'Объекты с id {self.missing[0]}, {self.missing[1]} '
+            f'не существуют.',
+        ])
+
+    def test_field_rejects_non_list(self):
+        for data in ('1', 1, None):
+            with self.subTest(data=data):
+                serializer = TagsSerializer(data={'tags': data})
+                with self.assertNumQueries(0):
+                    self.assertFalse(serializer.is_valid())
@@ -0,0 +1,67 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.tests.utils import (
+    create_ingredients,
+    create_recipe,
+    create_tags,
+    create_user,
+    get_client,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class TagsFilterTests(TestCase):
+    """Фильтр рецептов по тегам в режимах any и all."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user(0)
+        cls.tags = create_tags(3)
+        ingredients = create_ingredients(1)
+        first, second, third = cls.tags
+        cls.both = create_recipe(
+            author, (first, second, third), ingredients, name='Оба',
+        )
+        cls.first = create_recipe(author, (first,), ingredients, name='П')
+        cls.second = create_recipe(author, (second,), ingredients, name='В')
+        create_recipe(author, (third,), ingredients, name='Т')
+
+    def setUp(self):
+        cache.clear()
+        self.client = get_client()
+
+    def get_ids(self, tags, **params):
+        response = self.client.get('/api/recipes/', {
+            'tags': [tag.slug for tag in tags], 'limit': 10, **params,
+        })
+        self.assertEqual(response.status_code, 200)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(response.data['count'], len(ids))
+        return ids
+
+    def test_any_has_no_duplicates(self):
+        for params in ({}, {'tags_mode': 'any'}):
+            with self.subTest(params=params):
+                ids = self.get_ids(self.tags[:2], **params)
+                self.assertEqual(sorted(ids), sorted(
+                    (self.both.pk, self.first.pk, self.second.pk),
+                ))
+
+    def test_all_requires_every_tag(self):
+        self.assertEqual(
+            self.get_ids(self.tags[:2], tags_mode='all'), [self.both.pk],
+        )
+        self.assertEqual(
+            sorted(self.get_ids(self.tags[:1], tags_mode='all')),
+            sorted((self.both.pk, self.first.pk)),
+        )
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from app.models import Ingredient
+
+NAMES = (
+    'Соль',
+    'Соль морская',
+    'Солянка',
+    'Масло сливочное',
+    'Фасоль',
+    'Морская соль',
+    'Сахар',
+)
+
+
+@override_settings(INGREDIENT_SEARCH_LIMIT=4)
+class IngredientSearchTests(TestCase):
+    """Автодополнение ингредиентов по параметру name."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in NAMES
+        )
+
+    def setUp(self):
+        # Новая версия справочника перестраивает индекс в памяти
+        cache.clear()
+
+    def search(self, name):
+        response = self.client.get('/api/ingredients/', {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            self.search('сол'),
+            ['Соль', 'Солянка', 'Соль морская', 'Фасоль'],
+        )
+
+    def test_exact_match_comes_first(self):
+        self.assertEqual(
+            self.search('СОЛЬ'),
+            ['Соль', 'Соль морская', 'Фасоль', 'Морская соль'],
+        )
+
+    def test_substring_matches_fill_the_limit(self):
+        self.assertEqual(
+            self.search('морск'), ['Морская соль', 'Соль морская'],
+        )
+        self.assertEqual(self.search('сл'), ['Масло сливочное'])
+        self.assertEqual(self.search('перец'), [])
+
+    @override_settings(INGREDIENT_SEARCH_LIMIT=2)
+    def test_limit(self):
+        self.assertEqual(self.search('сол'), ['Соль', 'Солянка'])
+        self.assertEqual(self.search('оль'), ['Соль', 'Соль морская'])
+
+    def test_index_is_built_once(self):
+        self.search('сол')
+        with self.assertNumQueries(0):
+            self.search('сах')
@@ -0,0 +1,217 @@
+import re
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from app.models import Favourite, Follow, Recipe, ShoppingCart
+from api.tests.utils import (
+    IMAGE_BASE64,
+    create_ingredients,
+    create_recipe,
+    create_tags,
+    create_user,
+    get_client,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+# Запросы, изменяющие таблицу: (действие, таблица).
+WRITE = re.compile(r'(INSERT|UPDATE|DELETE)(?: INTO| FROM)? "(\w+)"')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class RecipeQueryCountTests(TestCase):
+    """Число запросов к рецептам не зависит от размера выборки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        authors = [create_user(index) for index in range(1, 4)]
+        cls.tags = create_tags(3)
+        cls.ingredients = create_ingredients(12)
+        for index in range(12):
+            recipe = create_recipe(
+                authors[index % len(authors)],
+                cls.tags[:index % 3 + 1],
+                cls.ingredients[index:index + 1 + index % 4],
+                name=f'Рецепт {index}',
+            )
+            if index % 2:
+                Favourite.objects.create(user=cls.user, recipe=recipe)
+            if index % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Follow.objects.create(user=cls.user, following=authors[0])
+        cls.small = create_recipe(
+            authors[0], cls.tags[:1], cls.ingredients[:1], name='Малый',
+        )
+        cls.large = create_recipe(
+            authors[1], cls.tags, cls.ingredients, name='Большой',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, client, url, data=None, method='get'):
+        # Первый запрос прогревает кэши процесса (токены, индексы).
+        getattr(client, method)(url, data, format='json')
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.data)
+        return len(context)
+
+    def assert_constant(self, counts):
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        for user in (self.user, None):
+            client = get_client(user)
+            with self.subTest(user=user):
+                self.assert_constant([
+                    self.count_queries(
+                        client, '/api/recipes/', {'limit': limit},
+                    )
+                    for limit in (1, 5, 14)
+                ])
+
+    def test_cursor_list_query_count_does_not_depend_on_page_size(self):
+        client = get_client(self.user)
+        self.assert_constant([
+            self.count_queries(
+                client, '/api/recipes/', {'limit': limit, 'cursor': ''},
+            )
+            for limit in (1, 5, 14)
+        ])
+
+    def test_retrieve_query_count_does_not_depend_on_recipe_size(self):
+        client = get_client(self.user)
+        self.assert_constant([
+            self.count_queries(client, f'/api/recipes/{recipe.pk}/')
+            for recipe in (self.small, self.large)
+        ])
+
+    def test_subscriptions_query_count_does_not_depend_on_page_size(self):
+        Follow.objects.bulk_create(
+            Follow(user=self.user, following=create_user(index))
+            for index in range(10, 13)
+        )
+        client = get_client(self.user)
+        self.assert_constant([
+            self.count_queries(
+                client,
+                '/api/users/subscriptions/',
+                {'limit': limit, 'recipes_limit': 3},
+            )
+            for limit in (1, 3)
+        ])
+
+    def test_create_query_count_does_not_depend_on_recipe_size(self):
+        client = get_client(self.user)
+        counts = []
+        for size in (1, 10):
+            counts.append(self.count_queries(
+                client,
+                '/api/recipes/',
+                {
+                    'name': f'Новый рецепт {size}',
+                    'text': 'Описание',
+                    'cooking_time': 10,
+                    'image': IMAGE_BASE64,
+                    'tags': [tag.pk for tag in self.tags[:size]],
+                    'ingredients': [
+                        {'id': ingredient.pk, 'amount': 5}
+                        for ingredient in self.ingredients[:size]
+                    ],
+                },
+                method='post',
+            ))
+            Recipe.objects.filter(name__startswith='Новый').delete()
+        self.assert_constant(counts)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class RecipeUpdateQueryTests(TestCase):
+    """PATCH рецепта меняет только отличающиеся теги и ингредиенты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.tags = create_tags(2)
+        cls.ingredients = create_ingredients(3)
+        cls.recipe = create_recipe(cls.author, cls.tags, cls.ingredients)
+
+    def setUp(self):
+        self.client = get_client(self.author)
+        # Прогревает кэш токенов
+        self.client.get('/api/users/me/')
+
+    def get_query_count(self, amount_changed):
+        """
+        Запросы PATCH без изменений: рецепт, автор и подписки для
+        проверки прав и ответа, ингредиенты и теги (по одному запросу
+        IN), SAVEPOINT и RELEASE, текущие теги и ингредиенты и три
+        запроса ответа;
+        блокировка рецепта там, где есть SELECT ... FOR UPDATE.
+        Изменение количества добавляет один bulk_update, поиск корзин
+        с рецептом и, на PostgreSQL, пересчёт поискового вектора
+        (UPDATE app_recipe).
+        """
+        count = 12 + connection.features.has_select_for_update
+        if amount_changed:
+            count += 2 + (connection.vendor == 'postgresql')
+        return count
+
+    def patch(self, amounts):
+        with self.assertNumQueries(
+            self.get_query_count(amounts != (10, 10, 10)),
+        ) as context:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {
+                    'tags': [tag.pk for tag in self.tags],
+                    'ingredients': [
+                        {'id': ingredient.pk, 'amount': amount}
+                        for ingredient, amount in zip(
+                            self.ingredients, amounts,
+                        )
+                    ],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        writes = (
+            WRITE.match(query['sql']) for query in context.captured_queries
+        )
+        return [match.groups() for match in writes if match]
+
+    def get_items(self):
+        return set(self.recipe.ingredient_in_recipes.values_list(
+            'pk', 'ingredient_id', 'amount',
+        ))
+
+    def test_patch_without_changes(self):
+        items = self.get_items()
+        self.assertEqual(self.patch((10, 10, 10)), [])
+        self.assertEqual(self.get_items(), items)
+
+    def test_patch_one_amount(self):
+        items = self.get_items()
+        writes = self.patch((10, 7, 10))
+        self.assertEqual(
+            [write for write in writes if write[1] != 'app_recipe'],
+            [('UPDATE', 'app_ingredientinrecipe')],
+        )
+        changed = self.ingredients[1].pk
+        self.assertEqual(self.get_items(), {
+            (pk, ingredient_id, 7 if ingredient_id == changed else amount)
+            for pk, ingredient_id, amount in items
+        })
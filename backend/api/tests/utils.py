@@ -0,0 +1,75 @@
+import base64
+import io
+
+from django.core.files.base import ContentFile
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app.models import (
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    Tag,
+    TagForRecipe,
+)
+from users.models import User
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+IMAGE = make_image()
+IMAGE_BASE64 = 'data:image/png;base64,' + base64.b64encode(IMAGE).decode()
+
+
+def create_user(index):
+    return User.objects.create_user(
+        email=f'user{index}@example.com',
+        username=f'user{index}',
+        first_name='Имя',
+        last_name='Фамилия',
+        password='password-12345',
+    )
+
+
+def create_tags(count):
+    return [
+        Tag.objects.create(
+            name=f'Тег {index}', color='#E26C2D', slug=f'tag{index}',
+        )
+        for index in range(count)
+    ]
+
+
+def create_ingredients(count):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {index}', measurement_unit='г')
+        for index in range(count)
+    )
+    return list(Ingredient.objects.order_by('pk'))
+
+
+def create_recipe(author, tags, ingredients, name='Рецепт'):
+    recipe = Recipe(author=author, name=name, text='Описание', cooking_time=5)
+    recipe.image.save('recipe.png', ContentFile(IMAGE), save=True)
+    TagForRecipe.objects.bulk_create(
+        TagForRecipe(recipe=recipe, tag=tag) for tag in tags
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=10)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+def get_client(user=None):
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
@@ -7,6 +7,7 @@ from api.views import (
     CustomUserViewSet,
     IngredientViewSet,
     RecipeViewSet,
+    StatsView,
     TagViewSet,
 )
 
@@ -42,4 +43,8 @@ urlpatterns = [
         'auth/',
         include('djoser.urls.authtoken')
     ),
+    path(
+        'internal/stats/',
+        StatsView.as_view()
+    ),
 ]
@@ -1,24 +1,36 @@
+from itertools import chain
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import F, Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework import permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from api.filters import IngredientSearchFilter, RecipeFilter
-from api.mixins import ListRetrieveCreateViewSet
+from api.cache import recipe_list_cache
+from api.filters import RecipeFilter
+from api.ingredient_index import ingredient_index
+from api.mixins import ConditionalGetMixin, ListRetrieveCreateViewSet
 from api.pagination import LimitPageNumberPagination
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import (
+    CSVShoppingListRenderer,
+    PlainTextShoppingListRenderer,
+)
 from api.serializers import (
     CreateRecipeSerializer,
     CreateUserSerializer,
     FollowSerializer,
     IngredientSerializer,
+    RecipeListBatchSerializer,
     RecipeSerializer,
     TagSerializer,
     UserSerializer,
@@ -26,19 +38,31 @@ from api.serializers import (
     ShoppingCartSerializer,
 )
 
+from app import user_lists
 from app.models import (
     Favourite,
     Ingredient,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
     Follow,
 )
+from app.versions import get_version
+
+from foodgram import db
+from foodgram.routers import primary_reads
 
 User = get_user_model()
 
+# Списки пользователя, доступные для пакетного изменения.
+BATCH_LISTS = {
+    'favorite': Favourite,
+    'shopping_cart': ShoppingCart,
+}
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     """ViewSet для тега."""
 
     queryset = Tag.objects.all()
@@ -46,16 +70,38 @@ class TagViewSet(ReadOnlyModelViewSet):
     pagination_class = None
     permission_classes = (permissions.AllowAny,)
 
+    def get_etag_parts(self):
+        return (get_version('tag'),)
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+
+class IngredientViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     """ViewSet для ингредиента."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = (permissions.AllowAny,)
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
+
+    def get_etag_parts(self):
+        return (get_version('ingredient'),)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Поиск по названию (параметр name; сначала совпадения
+        с началом названия, затем с его серединой) обслуживается
+        индексом в памяти без обращения к базе данных.
+        """
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(self.search, request)
+
+    def search(self, request):
+        ingredients = ingredient_index.search(
+            request.query_params['name'],
+            settings.INGREDIENT_SEARCH_LIMIT,
+        )
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
 
 
 class CustomUserViewSet(ListRetrieveCreateViewSet):
@@ -70,6 +116,26 @@ class CustomUserViewSet(ListRetrieveCreateViewSet):
             return CreateUserSerializer
         return UserSerializer
 
+    def get_recipes_limit(self):
+        """
+        Проверяет параметр recipes_limit и ограничивает его сверху
+        значением settings.RECIPES_LIMIT_MAX.
+        """
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return settings.RECIPES_LIMIT_MAX
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            raise ValidationError(
+                {'recipes_limit': 'Значение должно быть целым числом.'}
+            )
+        if recipes_limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'Значение не может быть отрицательным.'}
+            )
+        return min(recipes_limit, settings.RECIPES_LIMIT_MAX)
+
     @action(
         detail=False,
         url_path='subscriptions',
@@ -77,7 +143,17 @@ class CustomUserViewSet(ListRetrieveCreateViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        subscriptions = User.objects.filter(following__user=user)
+        subscriptions = User.objects.filter(
+            following__user=user,
+        ).order_by('id').prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=Recipe.objects.limited_per_author(
+                    self.get_recipes_limit(),
+                ),
+                to_attr='limited_recipes',
+            ),
+        )
         page = self.paginate_queryset(subscriptions)
         serializer = FollowSerializer(
             page,
@@ -133,7 +209,7 @@ class CustomUserViewSet(ListRetrieveCreateViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, ModelViewSet):
     """ViewSet для рецепта."""
 
     queryset = Recipe.objects.all()
@@ -142,14 +218,69 @@ class RecipeViewSet(ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     http_method_names = ('get', 'post', 'patch', 'delete')
+    etag_vary_headers = ('Authorization',)
+
+    def get_etag_parts(self):
+        """
+        ETag поддерживается только для отдельного рецепта: он зависит
+        от версии рецепта (её сбрасывает и изменение профиля автора),
+        справочников и списков (избранное, корзина, подписки)
+        текущего пользователя.
+        """
+        if self.action != 'retrieve':
+            return None
+        try:
+            pk = int(self.kwargs['pk'])
+        except ValueError:
+            return None
+        user = self.request.user
+        return (
+            get_version('recipe', pk),
+            get_version('tag'),
+            get_version('ingredient'),
+            user.pk,
+            get_version('user-lists', user.pk) if user.pk else None,
+        )
+
+    def get_queryset(self):
+        """
+        Для чтения подгружает связанные объекты заранее,
+        чтобы число запросов не зависело от размера страницы.
+        """
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            return queryset.with_related().with_user_flags(self.request.user)
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ('create', 'partial_update'):
             return CreateRecipeSerializer
         return RecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов для анонимных пользователей кэшируется
+        по нормализованной строке запроса (см. api.cache).
+        """
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        key = recipe_list_cache.make_key(request)
+        data = recipe_list_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        stamp = recipe_list_cache.get_stamp()
+        with primary_reads():
+            response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            recipe_list_cache.set(key, response.data, stamp)
+            response['X-Cache'] = 'MISS'
+        return response
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
+        context['subscriptions'] = set()
         if self.request.user.is_authenticated:
             context['subscriptions'] = set(
                 Follow.objects.filter(user=self.request.user).values_list(
@@ -159,117 +290,152 @@ class RecipeViewSet(ModelViewSet):
             )
         return context
 
-    @action(
-        methods=('post', 'delete'),
-        detail=True,
-        permission_classes=(permissions.IsAuthenticated,),
-    )
-    def add_to_favorite(self, request, pk):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-
-        if Favourite.objects.filter(user=user, recipe=recipe).exists():
-            favourite = Favourite.objects.get(user=user, recipe=recipe)
-            favourite.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-
-        serializer = FavouriteSerializer(
-            data={
-                'user': user.id,
-                'recipe': recipe.id
-            }
-        )
-        if serializer.is_valid():
-            serializer.save()
+    def get_recipe_id(self):
+        try:
+            return int(self.kwargs['pk'])
+        except ValueError:
+            raise Http404
+
+    def add_to_list(self, model, serializer_class, error):
+        """
+        Добавляет рецепт в избранное или корзину. Рецепт не загружается:
+        его существование проверяется только при неудачной вставке.
+        """
+        recipe_id = self.get_recipe_id()
+        if not user_lists.add_recipes(model, self.request.user.id, (
+            recipe_id,
+        )):
+            get_object_or_404(Recipe, pk=recipe_id)
             return Response(
-                data=serializer.data,
-                status=status.HTTP_201_CREATED
+                data={'errors': error},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-
+        serializer = serializer_class(
+            model(user=self.request.user, recipe_id=recipe_id),
+        )
         return Response(
-            data=serializer.errors,
-            status=status.HTTP_400_BAD_REQUEST
+            data=serializer.data,
+            status=status.HTTP_201_CREATED,
         )
 
+    def remove_from_list(self, model):
+        if not user_lists.remove_recipes(model, self.request.user.id, (
+            self.get_recipe_id(),
+        )):
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(
+        methods=('post',),
         detail=True,
-        methods=['delete'],
+        url_path='favorite',
         permission_classes=(permissions.IsAuthenticated,),
     )
-    def remove_from_favorite(self, request, pk):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-
-        favourite = get_object_or_404(Favourite, user=user, recipe=recipe)
-        favourite.delete()
+    def add_to_favorite(self, request, pk):
+        return self.add_to_list(
+            Favourite,
+            FavouriteSerializer,
+            'Рецепт уже добавлен в избранное.',
+        )
 
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @add_to_favorite.mapping.delete
+    def remove_from_favorite(self, request, pk):
+        return self.remove_from_list(Favourite)
 
     @action(
-        methods=['post'],
+        methods=('post',),
         detail=True,
+        url_path='shopping_cart',
         permission_classes=(permissions.IsAuthenticated,),
     )
     def add_to_shopping_cart(self, request, pk):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-            return Response(
-                data={'errors': 'Рецепт уже добавлен в корзину.'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        shopping_cart = ShoppingCart(user=user, recipe=recipe)
-        shopping_cart.save()
-
-        serializer = ShoppingCartSerializer(shopping_cart)
-        return Response(
-            data=serializer.data,
-            status=status.HTTP_201_CREATED,
+        return self.add_to_list(
+            ShoppingCart,
+            ShoppingCartSerializer,
+            'Рецепт уже добавлен в корзину.',
         )
 
     @add_to_shopping_cart.mapping.delete
     def remove_from_shopping_cart(self, request, pk):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
+        return self.remove_from_list(ShoppingCart)
 
-        shopping_cart = get_object_or_404(
-            ShoppingCart,
-            user=user,
-            recipe=recipe
-        )
-        shopping_cart.delete()
-
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @action(
+        methods=('post',),
+        detail=False,
+        url_path='batch',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def batch(self, request):
+        """
+        Добавляет или убирает несколько рецептов из избранного
+        или корзины одним запросом, например весь план питания.
+        """
+        serializer = RecipeListBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if data['action'] == 'add':
+            apply = user_lists.add_recipes
+        else:
+            apply = user_lists.remove_recipes
+        changed = apply(BATCH_LISTS[data['list']], request.user.id, data[
+            'recipes'
+        ])
+        return Response(data={
+            'changed': sorted(changed),
+            'skipped': sorted(set(data['recipes']) - set(changed)),
+        })
 
     @action(
         detail=False,
         url_path='download_shopping_cart',
         permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(
+            PlainTextShoppingListRenderer,
+            CSVShoppingListRenderer,
+        ),
     )
     def download_shopping_cart(self, request):
-        user = request.user
+        """
+        Отдаёт список покупок потоком в формате txt (по умолчанию)
+        или csv (?format=csv), читая готовый агрегат пользователя
+        (ShoppingListItem) серверным курсором.
+        """
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user,
+        ).values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('ingredient__name').iterator()
 
-        if not user.shopping_carts.exists():
+        first = next(ingredients, None)
+        if first is None:
             return Response(
                 data={'errors': 'Корзина пуста.'},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        ingredients = Ingredient.objects.filter(
-            ingredient_in_recipes__recipe__shopping_carts__user=user,
-        ).values(
-            'name',
-            'measurement_unit',
-        ).annotate(
-            amount=Sum('ingredient_in_recipes__amount'),
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.render_rows(chain((first,), ingredients)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
         )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
+        )
+        return response
+
+
+class StatsView(APIView):
+    """Служебная статистика для администраторов."""
 
-        shopping_cart = [''.join(
-            f'{ingredient["name"]} '
-            f'({ingredient["measurement_unit"]}) - '
-            f'{ingredient["amount"]}\n'
-        ) for ingredient in ingredients]
+    permission_classes = (permissions.IsAdminUser,)
 
-        return HttpResponse(shopping_cart, content_type='text/plain')
+    def get(self, request):
+        return Response({
+            'recipe_list_cache': {
+                **recipe_list_cache.stats(),
+                'shared': recipe_list_cache.is_shared(),
+            },
+            'db_connections': db.get_stats(),
+        })
@@ -1,4 +1,9 @@
+from copy import copy
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db import transaction
 
 from app.models import (
     Favourite,
@@ -7,27 +12,114 @@ from app.models import (
     IngredientInRecipe,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
     Tag,
     TagForRecipe,
 )
+from app import counters, shopping_list
+from app.search import update_search_vectors
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Виджет автодополнения, который берёт выбранный объект из формы,
+    а не запрашивает его из базы отдельно для каждой строки.
+    """
+
+    selected_object = None
+
+    def optgroups(self, name, value, attr=None):
+        obj = self.selected_object
+        if obj is None or [str(v) for v in value if v] != [str(obj.pk)]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(
+            self.create_option(name, str(obj.pk), str(obj), True, len(options))
+        )
+        return [(None, options, 0)]
+
+
+class CountedObjectAdmin(admin.ModelAdmin):
+    """
+    Переносит счётчики (см. app.counters) на другой объект, если
+    в форме изменена связь с ним. Создание и удаление учитываются
+    сигналами.
+    """
+
+    def save_model(self, request, obj, form, change):
+        fields = set(form.changed_data) if change else set()
+        with transaction.atomic():
+            if fields:
+                old = copy(obj)
+                for name in fields:
+                    field = obj._meta.get_field(name)
+                    if field.many_to_one:
+                        setattr(old, field.attname, form.initial[name])
+                counters.change_related_counters(old, -1, fields)
+                counters.change_related_counters(obj, 1, fields)
+            super().save_model(request, obj, form, change)
+
+
+class PreloadedAutocompleteForm(forms.ModelForm):
+    """Передаёт связанные объекты строки в виджеты автодополнения."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is None:
+            return
+        for name, field in self.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, PreloadedAutocompleteSelect):
+                widget.selected_object = getattr(self.instance, name)
+
+
+class PreloadedAutocompleteInline(admin.TabularInline):
+    """
+    Строчная форма, у которой поля автодополнения не выполняют
+    отдельных запросов на каждую строку. Связанные объекты должны
+    загружаться в get_queryset через select_related.
+    """
 
+    form = PreloadedAutocompleteForm
 
-class IngredientInRecipeInline(admin.TabularInline):
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field,
+                self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class IngredientInRecipeInline(PreloadedAutocompleteInline):
     """
     Позволяет редактировать модель ингредиентов в рецепте
     на той же странице, что и модель-родитель.
     """
     model = IngredientInRecipe
     extra = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient',
+        )
 
 
-class TagForRecipeInline(admin.TabularInline):
+class TagForRecipeInline(PreloadedAutocompleteInline):
     """
     Позволяет редактировать модель тегов в рецепте
     на той же странице, что и модель-родитель.
     """
     model = TagForRecipe
     extra = 1
+    autocomplete_fields = ('tag',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('recipe', 'tag')
 
 
 @admin.register(Tag)
@@ -35,6 +127,7 @@ class TagAdmin(admin.ModelAdmin):
     """Панель администратора для модели тегов."""
 
     list_display = ('id', 'name', 'color', 'slug')
+    search_fields = ('name', 'slug')
 
 
 @admin.register(Ingredient)
@@ -42,22 +135,39 @@ class IngredientAdmin(admin.ModelAdmin):
     """Панель администратора для модели ингредиентов."""
 
     list_display = ('name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    search_fields = ('name',)
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(CountedObjectAdmin):
     """Панель администратора для модели рецептов."""
 
-    list_display = ('author', 'name', 'get_is_favorited')
-    list_filter = ('author', 'name', 'tags')
+    list_display = (
+        'author', 'name', 'get_is_favorited', 'shopping_carts_count',
+    )
+    list_select_related = ('author',)
+    list_filter = ('tags',)
+    search_fields = ('name', 'author__username', 'author__email')
+    autocomplete_fields = ('author',)
+    readonly_fields = ('favorites_count', 'shopping_carts_count')
     inlines = (IngredientInRecipeInline, TagForRecipeInline)
 
     def get_is_favorited(self, obj):
-        """Метод подсчитывает количество добавлений рецепта в избранное."""
-        return obj.favourites.count()
+        """Метод возвращает количество добавлений рецепта в избранное."""
+        return obj.favorites_count
 
     get_is_favorited.short_description = 'количество добавлений в избранное'
+    get_is_favorited.admin_order_field = 'favorites_count'
+
+    def save_related(self, request, form, formsets, change):
+        """
+        Переносит изменения ингредиентов рецепта из инлайна в списки
+        покупок и пересчитывает поисковый вектор.
+        """
+        with shopping_list.track_recipes((form.instance.pk,)):
+            super().save_related(request, form, formsets, change)
+        update_search_vectors((form.instance.pk,))
 
 
 @admin.register(IngredientInRecipe)
@@ -65,6 +175,25 @@ class IngredientInRecipeAdmin(admin.ModelAdmin):
     """Панель администратора для модели ингредиентов в рецептах."""
 
     list_display = ('id', 'recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id, form.initial.get('recipe')} - {None}
+        with shopping_list.track_recipes(recipe_ids):
+            super().save_model(request, obj, form, change)
+        update_search_vectors(recipe_ids)
+
+    def delete_model(self, request, obj):
+        with shopping_list.track_recipes((obj.recipe_id,)):
+            super().delete_model(request, obj)
+        update_search_vectors((obj.recipe_id,))
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        with shopping_list.track_recipes(recipe_ids):
+            super().delete_queryset(request, queryset)
+        update_search_vectors(recipe_ids)
 
 
 @admin.register(TagForRecipe)
@@ -72,24 +201,76 @@ class TagForRecipeAdmin(admin.ModelAdmin):
     """Панель администратора для модели тегов в рецептах."""
 
     list_display = ('id', 'recipe', 'tag')
+    list_select_related = ('recipe', 'tag')
+    autocomplete_fields = ('recipe', 'tag')
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(CountedObjectAdmin):
     """Панель администратора для модели подписок."""
 
     list_display = ('id', 'user', 'following')
+    list_select_related = ('user', 'following')
+    autocomplete_fields = ('user', 'following')
 
 
 @admin.register(Favourite)
-class FavouriteAdmin(admin.ModelAdmin):
+class FavouriteAdmin(CountedObjectAdmin):
     """Панель администратора для модели избранного."""
 
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(CountedObjectAdmin):
     """Панель администратора для модели корзины покупок."""
 
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+
+    def save_model(self, request, obj, form, change):
+        """Переносит изменение корзины в список покупок."""
+        with transaction.atomic():
+            if change:
+                shopping_list.remove_recipes(
+                    form.initial['user'], (form.initial['recipe'],),
+                )
+            super().save_model(request, obj, form, change)
+            shopping_list.add_recipes(obj.user_id, (obj.recipe_id,))
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            shopping_list.remove_recipes(obj.user_id, (obj.recipe_id,))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            items = list(queryset.values_list('user_id', 'recipe_id'))
+            super().delete_queryset(request, queryset)
+            for user_id, recipe_id in items:
+                shopping_list.remove_recipes(user_id, (recipe_id,))
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    """
+    Панель администратора для модели списков покупок. Списки
+    выводятся из корзин (см. app.shopping_list), поэтому доступны
+    только для просмотра; исправить их можно командой
+    rebuild_shopping_lists.
+    """
+
+    list_display = ('id', 'user', 'ingredient', 'amount')
+    list_select_related = ('user', 'ingredient')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
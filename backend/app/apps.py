@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        import app.checks  # noqa: F401
+        import app.signals  # noqa: F401
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Кэши, которые видит только текущий процесс.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Версии ресурсов (app.versions) сбрасываются через кэш по умолчанию.
+    Если кэш свой у каждого процесса, запись в одном воркере не сбросит
+    индекс ингредиентов, ETag и кэш ответов в остальных.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'Кэш по умолчанию не общий для процессов: при нескольких '
+        'воркерах версии ресурсов и кэши ответов расходятся.',
+        hint='Задайте REDIS_URL (см. docker-compose.yml).',
+        obj=backend,
+        id='app.W001',
+    )]
@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from app.models import Favourite, Follow, Recipe, ShoppingCart
+from app.versions import bump_recipe_version
+
+User = get_user_model()
+
+# Счётчики: (модель, поле счётчика, модель связи, поле связи).
+COUNTERS = (
+    (Recipe, 'favorites_count', Favourite, 'recipe'),
+    (Recipe, 'shopping_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'following'),
+)
+
+
+def _change(model, pks, field, delta):
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_recipes_counter(recipe_ids, field, delta):
+    """
+    Атомарно меняет счётчик у нескольких рецептов одним запросом.
+    Состав списков рецептов от счётчиков не зависит, поэтому
+    сбрасываются только версии самих рецептов.
+    """
+    if not recipe_ids:
+        return
+    _change(Recipe, recipe_ids, field, delta)
+    for recipe_id in recipe_ids:
+        bump_recipe_version(recipe_id, listing=False)
+
+
+def change_recipe_counter(recipe_id, field, delta):
+    """Атомарно меняет счётчик рецепта."""
+    change_recipes_counter((recipe_id,), field, delta)
+
+
+def change_user_counter(user_id, field, delta):
+    """Атомарно меняет счётчик пользователя."""
+    _change(User, (user_id,), field, delta)
+
+
+def change_related_counters(instance, delta, fields=None):
+    """
+    Меняет на delta счётчики, которые считают объекты модели instance
+    (см. COUNTERS). fields ограничивает их полями связи.
+    """
+    for model, field, related_model, related_field in COUNTERS:
+        if not isinstance(instance, related_model):
+            continue
+        if fields is not None and related_field not in fields:
+            continue
+        pk = getattr(
+            instance, instance._meta.get_field(related_field).attname,
+        )
+        if model is Recipe:
+            change_recipe_counter(pk, field, delta)
+        else:
+            _change(model, (pk,), field, delta)
+
+
+def get_actual_count(related_model, related_field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{related_field: OuterRef('pk')},
+            ).order_by().values(related_field).annotate(
+                count=Count('pk'),
+            ).values('count')
+        ),
+        0,
+    )
+
+
+def reconcile(counters=COUNTERS):
+    """
+    Пересчитывает счётчики по связанным таблицам и возвращает
+    словарь {'модель.поле': число исправленных строк}.
+    """
+    fixed = {}
+    for model, field, related_model, related_field in counters:
+        actual = get_actual_count(related_model, related_field)
+        fixed[f'{model._meta.label}.{field}'] = model.objects.annotate(
+            actual_count=actual,
+        ).exclude(
+            **{field: F('actual_count')},
+        ).update(**{field: actual})
+    return fixed
@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+from django.db import connection, models
+from django.db.models.fields.files import ImageFieldFile
+
+
+def lock_file_name(name):
+    """
+    Блокирует имя файла до конца текущей транзакции (рекомендательная
+    блокировка PostgreSQL). Её берут и сохранение файла, и удаление
+    неиспользуемого (app.images.delete_unused_image), поэтому удаление
+    не вклинится между проверкой, что файл уже есть, и коммитом
+    рецепта, который на него ссылается. Вне транзакции и на других
+    СУБД ничего не делает.
+    """
+    if connection.vendor != 'postgresql' or not connection.in_atomic_block:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [name])
+
+
+class ContentHashImageFieldFile(ImageFieldFile):
+    """Файл изображения, имя которого строится по хэшу содержимого."""
+
+    def save(self, name, content, save=True):
+        """
+        Сохраняет файл под именем по хэшу содержимого. Если такой файл
+        уже есть в хранилище, он используется повторно: имя блокируется
+        (см. lock_file_name), чтобы файл не удалили до коммита.
+        """
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hex_digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = self.field.generate_filename(
+            self.instance, f'{hex_digest[:2]}/{hex_digest}{extension}',
+        )
+        lock_file_name(name)
+        if not self.storage.exists(name):
+            name = self.storage.save(
+                name, content, max_length=self.field.max_length,
+            )
+        self.name = name
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+
+
+class ContentHashImageField(models.ImageField):
+    """
+    Поле изображения, сохраняющее файлы под именем SHA-256 их
+    содержимого: <upload_to>/ab/abcdef....png. Содержимое файла
+    с таким именем никогда не меняется, поэтому его URL можно
+    кэшировать навсегда.
+    """
+
+    attr_class = ContentHashImageFieldFile
@@ -0,0 +1,204 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils.encoding import filepath_to_uri
+
+from PIL import Image, ImageOps
+
+from app.fields import lock_file_name
+from app.models import Recipe
+from app.versions import bump_recipe_version
+
+logger = logging.getLogger(__name__)
+
+# Форматы копий и параметры сохранения Pillow.
+IMAGE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {
+        'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True,
+    },
+}
+
+_executor = None
+
+
+def media_url(name):
+    """
+    Строит URL файла из MEDIA_URL и имени без обращения к хранилищу,
+    экранируя имя так же, как FileSystemStorage.url. Имена файлов
+    изображений строятся по хэшу содержимого
+    (см. app.fields.ContentHashImageField), поэтому URL неизменяемы.
+    """
+    return f'{settings.MEDIA_URL}{filepath_to_uri(name).lstrip("/")}'
+
+
+def get_executor():
+    """Возвращает пул потоков обработки изображений процесса."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_WORKERS,
+            thread_name_prefix='recipe-image',
+        )
+    return _executor
+
+
+def render_variant(image, width, image_format):
+    """Уменьшает изображение до ширины width и кодирует его."""
+    variant = image.copy()
+    if variant.width > width:
+        variant.thumbnail((width, variant.height * width // variant.width))
+    options = IMAGE_FORMATS[image_format]
+    if options['format'] == 'JPEG' and variant.mode == 'RGBA':
+        background = Image.new('RGB', variant.size, 'white')
+        background.paste(variant, mask=variant.getchannel('A'))
+        variant = background
+    buffer = io.BytesIO()
+    variant.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def get_variant_names(name):
+    """
+    Возвращает имена уменьшенных копий изображения name по размерам
+    и форматам: {размер: {формат: имя}}. Имя копии определяется хэшем
+    исходного файла, размером и форматом.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return {
+        variant: {
+            image_format: (
+                f'images/variants/{stem}-{variant}-{width}.{image_format}'
+            )
+            for image_format in IMAGE_FORMATS
+        }
+        for variant, width in settings.RECIPE_IMAGE_VARIANTS.items()
+    }
+
+
+def process_recipe_image(recipe_id):
+    """
+    Создаёт уменьшенные копии изображения рецепта для всех размеров
+    из settings.RECIPE_IMAGE_VARIANTS во всех форматах IMAGE_FORMATS.
+
+    Результат записывается, только если изображение рецепта
+    не сменилось за время обработки.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    original_name = recipe.image.name
+    try:
+        with recipe.image.open('rb') as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        variants = get_variant_names(original_name)
+        for variant, formats in variants.items():
+            width = settings.RECIPE_IMAGE_VARIANTS[variant]
+            for image_format, name in formats.items():
+                # Готовую копию того же файла можно не пересоздавать.
+                if not default_storage.exists(name):
+                    content = render_variant(image, width, image_format)
+                    formats[image_format] = default_storage.save(
+                        name, ContentFile(content),
+                    )
+        status = Recipe.ImageStatus.READY
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception('Не удалось обработать изображение %s', recipe_id)
+        variants = {}
+        status = Recipe.ImageStatus.FAILED
+    updated = Recipe.objects.filter(
+        pk=recipe_id,
+        image=original_name,
+    ).update(image_variants=variants, image_status=status)
+    if updated:
+        bump_recipe_version(recipe_id, listing=False)
+    else:
+        # Изображение сменили во время обработки: созданные копии
+        # больше никому не нужны.
+        delete_unused_image(original_name)
+
+
+def mark_failed(recipe_id):
+    """Помечает необработанное изображение рецепта как ошибочное."""
+    updated = Recipe.objects.filter(
+        pk=recipe_id,
+        image_status=Recipe.ImageStatus.PENDING,
+    ).update(image_status=Recipe.ImageStatus.FAILED)
+    if updated:
+        bump_recipe_version(recipe_id, listing=False)
+
+
+def _process(recipe_id):
+    """
+    Обрабатывает изображение; при любой непредвиденной ошибке рецепт
+    помечается как FAILED, чтобы не остаться в PENDING навсегда.
+    """
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Ошибка обработки изображения %s', recipe_id)
+        mark_failed(recipe_id)
+
+
+def _process_in_worker(recipe_id):
+    close_old_connections()
+    try:
+        _process(recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_recipe_image(recipe_id):
+    """
+    Ставит обработку изображения рецепта в пул потоков после коммита
+    текущей транзакции. При RECIPE_IMAGE_WORKERS = 0 изображение
+    обрабатывается сразу после коммита в текущем потоке.
+    """
+    if settings.RECIPE_IMAGE_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(_process_in_worker, recipe_id)
+        )
+    else:
+        transaction.on_commit(lambda: _process(recipe_id))
+
+
+def delete_unused_image(name):
+    """
+    Удаляет файл изображения и его уменьшенные копии, если на файл
+    не ссылается ни один рецепт. Файлы с одинаковым содержимым у разных
+    рецептов общие (см. app.fields.ContentHashImageField), поэтому
+    проверка и удаление выполняются под блокировкой имени: рецепт,
+    повторно использующий файл, либо уже закоммичен и будет найден,
+    либо дождётся удаления и запишет файл заново.
+    """
+    if not name:
+        return
+    with transaction.atomic():
+        lock_file_name(name)
+        if Recipe.objects.filter(image=name).exists():
+            return
+        names = [name]
+        for formats in get_variant_names(name).values():
+            names.extend(formats.values())
+        for file_name in names:
+            try:
+                default_storage.delete(file_name)
+            except OSError:
+                logger.exception('Не удалось удалить файл %s', file_name)
+
+
+def schedule_image_cleanup(name):
+    """
+    Удаляет неиспользуемое изображение после коммита текущей
+    транзакции, например после замены изображения рецепта.
+    """
+    transaction.on_commit(lambda: delete_unused_image(name))
@@ -0,0 +1,390 @@
+import random
+import statistics
+import time
+from contextlib import ExitStack
+from itertools import combinations
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app import counters, shopping_list
+from app.models import (
+    Favourite,
+    Follow,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+    TagForRecipe,
+)
+from app.search import update_search_vectors
+from app.versions import bump_version
+
+User = get_user_model()
+
+# Бюджеты сценариев на PostgreSQL: наибольшее число SQL-запросов
+# за один вызов и 95-й перцентиль задержки в миллисекундах.
+# Сценарии favorite и shopping_cart — пара запросов POST и DELETE.
+BUDGETS = {
+    'recipes:list:anonymous': (6, 150),
+    'recipes:list:anonymous:cached': (0, 30),
+    'recipes:list': (7, 150),
+    'recipes:detail': (5, 60),
+    'recipes:detail:anonymous': (4, 60),
+    'users:subscriptions': (5, 150),
+    'ingredients:search': (1, 30),
+    'recipes:favorite': (2, 60),
+    'recipes:shopping_cart': (6, 100),
+    'recipes:download_shopping_cart': (2, 100),
+}
+
+# На остальных СУБД поиск и списки пользователей работают
+# через запасные реализации, которым нужно больше запросов.
+FALLBACK_QUERY_BUDGETS = {
+    'recipes:list': 9,
+    'recipes:favorite': 9,
+    'recipes:shopping_cart': 19,
+}
+
+# Фильтры RecipeFilter; проверяются все их сочетания.
+RECIPE_FILTERS = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags',
+                  'tags_mode', 'search')
+
+WORDS = (
+    'борщ', 'суп', 'салат', 'пирог', 'каша', 'рагу', 'плов', 'омлет',
+    'запеканка', 'котлеты', 'блины', 'соус', 'паста', 'гуляш',
+)
+
+
+def get_query_budget(name):
+    """Бюджет числа SQL-запросов сценария для текущей СУБД."""
+    max_queries = BUDGETS[name][0]
+    if connection.vendor != 'postgresql':
+        return FALLBACK_QUERY_BUDGETS.get(name, max_queries)
+    return max_queries
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, int(round(percent / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    """
+    Команда для нагрузочной проверки API с бюджетами
+    на число SQL-запросов и задержку.
+    """
+
+    help = (
+        'Заполняет тестовую базу, прогоняет основные запросы API '
+        'и проверяет бюджеты числа SQL-запросов и задержки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help='Количество пользователей.',
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=300,
+            help='Количество рецептов.',
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Количество ингредиентов.',
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Количество повторов каждого запроса.',
+        )
+        parser.add_argument(
+            '--latency-scale', type=float, default=1.0,
+            help='Множитель бюджетов задержки для медленных машин.',
+        )
+        parser.add_argument(
+            '--skip-latency', action='store_true',
+            help='Проверять только число SQL-запросов.',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных данных.',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Обработчик команды.
+
+        Использование команды:
+        python manage.py benchmark_api [--users N] [--recipes N]
+            [--ingredients N] [--iterations N] [--latency-scale K]
+            [--skip-latency] [--seed N]
+
+        Команда создаёт отдельную тестовую базу (как manage.py test),
+        заполняет её, выполняет запросы через тестовый клиент и удаляет
+        базу. Для каждого сценария выводятся перцентили задержки и
+        наибольшее число SQL-запросов; первый вызов каждого сценария
+        прогревает кэши и не учитывается, а анонимный список рецептов
+        замеряется отдельно с очисткой кэша и с попаданием в кэш.
+        Бюджеты SQL-запросов также проверяются тестами
+        (api.tests.test_budgets). При превышении бюджета (BUDGETS)
+        команда завершается с ошибкой, поэтому её можно запускать
+        перед деплоем.
+        """
+        if options['iterations'] < 1:
+            raise CommandError(
+                'Количество повторов должно быть положительным.'
+            )
+        self.random = random.Random(options['seed'])
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            cache.clear()
+            self.seed(options)
+            results = self.run_scenarios(options['iterations'])
+        finally:
+            # Открытые соединения (в том числе с репликами-зеркалами)
+            # не дали бы удалить тестовую базу.
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            cache.clear()
+        self.report(results, options)
+
+    def seed(self, options):
+        self.stdout.write('Заполнение тестовой базы...')
+        users = [
+            User(
+                email=f'user{index}@example.com',
+                username=f'user{index}',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for index in range(options['users'])
+        ]
+        User.objects.bulk_create(users)
+        users = list(User.objects.order_by('pk'))
+        Token.objects.bulk_create(Token(
+            key=Token.generate_key(),
+            user=user,
+        ) for user in users)
+        Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+                ('Ужин', '#8775D2', 'dinner'),
+            )
+        )
+        tags = list(Tag.objects.all())
+        Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f'{self.random.choice(WORDS)} ингредиент {index}',
+                measurement_unit=self.random.choice(('г', 'мл', 'шт')),
+            )
+            for index in range(options['ingredients'])
+        )
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=self.random.choice(users),
+                name=f'{self.random.choice(WORDS).capitalize()} {index}',
+                text=' '.join(self.random.choices(WORDS, k=20)),
+                image='images/benchmark.png',
+                cooking_time=self.random.randint(5, 120),
+            )
+            for index in range(options['recipes'])
+        )
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.random.sample(ingredient_ids, 10)
+        )
+        TagForRecipe.objects.bulk_create(
+            TagForRecipe(recipe_id=recipe_id, tag=tag)
+            for recipe_id in recipe_ids
+            for tag in self.random.sample(tags, self.random.randint(1, 3))
+        )
+        for model, per_user in ((Favourite, 20), (ShoppingCart, 5)):
+            model.objects.bulk_create(
+                model(user=user, recipe_id=recipe_id)
+                for user in users
+                for recipe_id in self.random.sample(recipe_ids, per_user)
+            )
+        Follow.objects.bulk_create(
+            Follow(user=user, following=following)
+            for user in users
+            for following in self.random.sample(users, 10)
+            if following != user
+        )
+        counters.reconcile()
+        shopping_list.rebuild()
+        update_search_vectors()
+        for name in ('ingredient', 'tag', 'recipe'):
+            bump_version(name)
+        self.users = users
+        self.tags = tags
+        self.recipe_ids = recipe_ids
+
+    def get_client(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.credentials(
+                HTTP_AUTHORIZATION=f'Token {user.auth_token.key}',
+            )
+        return client
+
+    def get_filter_params(self):
+        """Все сочетания фильтров RecipeFilter с тестовыми значениями."""
+        values = {
+            'is_favorited': 1,
+            'is_in_shopping_cart': 1,
+            'author': self.users[1].pk,
+            'tags': [self.tags[0].slug, self.tags[1].slug],
+            'tags_mode': 'all',
+            'search': WORDS[0],
+        }
+        for size in range(len(RECIPE_FILTERS) + 1):
+            for names in combinations(RECIPE_FILTERS, size):
+                yield {name: values[name] for name in names}
+
+    def measure(self, name, request, iterations, prepare=None):
+        """
+        Выполняет запрос iterations раз после прогревочного вызова.
+        prepare вызывается перед каждым замером и в него не входит.
+        Учитываются запросы ко всем базам, включая реплики.
+        """
+        request()
+        timings, queries = [], []
+        for _ in range(iterations):
+            if prepare is not None:
+                prepare()
+            with ExitStack() as stack:
+                contexts = [
+                    stack.enter_context(CaptureQueriesContext(db))
+                    for db in connections.all()
+                ]
+                started = time.perf_counter()
+                response = request()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{name}: неожиданный ответ {response.status_code}.'
+                )
+            queries.append(sum(len(context) for context in contexts))
+        return timings, queries
+
+    def run_scenarios(self, iterations):
+        self.stdout.write('Выполнение запросов...')
+        user = self.users[0]
+        client = self.get_client(user)
+        anonymous = self.get_client()
+        recipe_id = self.recipe_ids[0]
+        free_recipe_id = Recipe.objects.exclude(
+            favourites__user=user,
+        ).exclude(shopping_carts__user=user).values_list(
+            'pk', flat=True,
+        ).first()
+        results = {}
+
+        def add(name, request, count=iterations, prepare=None):
+            timings, queries = self.measure(name, request, count, prepare)
+            total = results.setdefault(name, ([], []))
+            total[0].extend(timings)
+            total[1].extend(queries)
+
+        # Без сброса кэша замерялись бы только попадания в кэш списка.
+        add(
+            'recipes:list:anonymous',
+            lambda: anonymous.get('/api/recipes/'),
+            prepare=cache.clear,
+        )
+        add(
+            'recipes:list:anonymous:cached',
+            lambda: anonymous.get('/api/recipes/'),
+        )
+        for params in self.get_filter_params():
+            add(
+                'recipes:list',
+                lambda: client.get('/api/recipes/', params),
+                max(1, iterations // 10),
+            )
+        add(
+            'recipes:detail',
+            lambda: client.get(f'/api/recipes/{recipe_id}/'),
+        )
+        add(
+            'recipes:detail:anonymous',
+            lambda: anonymous.get(f'/api/recipes/{recipe_id}/'),
+        )
+        add(
+            'users:subscriptions',
+            lambda: client.get(
+                '/api/users/subscriptions/', {'recipes_limit': 3},
+            ),
+        )
+        add(
+            'ingredients:search',
+            lambda: anonymous.get('/api/ingredients/', {'name': WORDS[1]}),
+        )
+        for action in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{free_recipe_id}/{action}/'
+
+            def toggle(url=url):
+                client.post(url)
+                return client.delete(url)
+
+            add(f'recipes:{action}', toggle)
+        add(
+            'recipes:download_shopping_cart',
+            lambda: client.get('/api/recipes/download_shopping_cart/'),
+        )
+        return results
+
+    def report(self, results, options):
+        failures = []
+        for name, (timings, queries) in results.items():
+            max_queries = get_query_budget(name)
+            max_latency = BUDGETS[name][1] * options['latency_scale']
+            p95 = percentile(timings, 95)
+            self.stdout.write(
+                f'{name}: p50 {statistics.median(timings):.1f} мс, '
+                f'p95 {p95:.1f} мс, p99 {percentile(timings, 99):.1f} мс, '
+                f'SQL-запросов до {max(queries)} (бюджет {max_queries})'
+            )
+            if max(queries) > max_queries:
+                failures.append(
+                    f'{name}: {max(queries)} SQL-запросов '
+                    f'при бюджете {max_queries}'
+                )
+            if not options['skip_latency'] and p95 > max_latency:
+                failures.append(
+                    f'{name}: p95 {p95:.1f} мс '
+                    f'при бюджете {max_latency:.0f} мс'
+                )
+        if failures:
+            raise CommandError(
+                'Бюджеты превышены:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
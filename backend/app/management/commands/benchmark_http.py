@@ -0,0 +1,117 @@
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management import BaseCommand, CommandError
+
+DEFAULT_PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=%D0%BC%D0%BE%D0%BB',
+    '/api/recipes/1/',
+)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, int(round(percent / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    """
+    Команда для нагрузочного сравнения режимов WSGI и ASGI.
+    """
+
+    help = 'Измеряет запросы в секунду и задержки работающего сервера.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='Адрес сервера.',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Путь для проверки; можно указать несколько раз.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Количество запросов на каждый путь.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=16,
+            help='Количество одновременных клиентов.',
+        )
+        parser.add_argument(
+            '--token',
+            help='Токен для заголовка Authorization.',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Обработчик команды.
+
+        Использование команды:
+        python manage.py benchmark_http [--url URL] [--path PATH ...]
+            [--requests N] [--concurrency N] [--token TOKEN]
+
+        Для сравнения запустите сервер в режиме WSGI и в режиме ASGI
+        с одинаковым количеством воркеров (см. Dockerfile, переменные
+        SERVER_MODE и WEB_WORKERS) и выполните команду для каждого.
+        Каждый клиент держит своё keep-alive соединение.
+        """
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Поддерживаются только адреса http://.')
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('Значения должны быть положительными.')
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        local = threading.local()
+
+        def fetch(path):
+            connection = getattr(local, 'connection', None)
+            if connection is None:
+                connection = local.connection = http.client.HTTPConnection(
+                    url.hostname, url.port or 80, timeout=30,
+                )
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                local.connection = None
+                status = None
+            return status, time.perf_counter() - started
+
+        for path in options['paths'] or DEFAULT_PATHS:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                results = list(executor.map(
+                    fetch, [path] * options['requests'],
+                ))
+            elapsed = time.perf_counter() - started
+            latencies = [latency * 1000 for _, latency in results]
+            errors = sum(
+                status is None or status >= 400 for status, _ in results
+            )
+            self.stdout.write(
+                f'{path}: {len(results) / elapsed:.1f} запр/с, '
+                f'p50 {statistics.median(latencies):.1f} мс, '
+                f'p99 {percentile(latencies, 99):.1f} мс, '
+                f'ошибок {errors}'
+            )
@@ -1,25 +1,123 @@
 import csv
+import io
+import json
+import os
+import re
+import time
+from itertools import islice
 
 from app.models import Ingredient
+from app.versions import bump_version
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
 from foodgram.settings import LOAD_DATA_DIR
 
+JSON_CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'\s*')
+
+
+def read_csv(file):
+    """Построчно читает пары (название, единица измерения) из CSV."""
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """
+    Потоково читает JSON-массив объектов с ключами name
+    и measurement_unit, не загружая файл в память целиком.
+    """
+    decoder = json.JSONDecoder()
+    number = 0
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON-файл должен содержать массив.')
+    # Буфер не копируется после каждого объекта: позиция разбора
+    # хранится в index, а прочитанное начало отбрасывается
+    # только при дочитывании файла.
+    index = 1
+    eof = False
+    while True:
+        index = WHITESPACE.match(buffer, index).end()
+        if buffer.startswith(',', index):
+            index = WHITESPACE.match(buffer, index + 1).end()
+        if buffer.startswith(']', index):
+            return
+        try:
+            obj, index = decoder.raw_decode(buffer, index)
+        except ValueError:
+            if eof:
+                raise CommandError('Неожиданный конец JSON-файла.')
+            chunk = file.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[index:] + chunk
+            index = 0
+            continue
+        number += 1
+        if not isinstance(obj, dict):
+            raise CommandError(
+                f'Элемент {number} JSON-массива должен быть объектом.'
+            )
+        name = obj.get('name', '')
+        measurement_unit = obj.get('measurement_unit', '')
+        if not isinstance(name, str) or not isinstance(measurement_unit, str):
+            raise CommandError(
+                f'Поля name и measurement_unit элемента {number} '
+                f'должны быть строками.'
+            )
+        yield name, measurement_unit
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
 
 class Command(BaseCommand):
-    """Команда для загрузки ингредиентов в базу данных из файла CSV."""
+    """
+    Команда для загрузки ингредиентов в базу данных
+    из файла CSV или JSON.
+    """
+
+    help = 'Загружает ингредиенты из файла CSV или JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=os.path.join(LOAD_DATA_DIR, 'ingredients.csv'),
+            help='Путь к файлу с ингредиентами.',
+        )
+        parser.add_argument(
+            '--format',
+            choices=tuple(READERS),
+            help='Формат файла; по умолчанию определяется по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одной пачке.',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY даже на PostgreSQL.',
+        )
 
     def handle(self, *args, **options):
         """
         Обработчик команды.
 
         Использование команды:
-        python manage.py load_ingredients
+        python manage.py import_ingredients_csv [--file PATH]
+            [--format csv|json] [--batch-size N] [--no-copy]
 
-        Эта команда загружает ингредиенты
-        из файла ingredients.csv в базу данных.
-        Файл ingredients.csv должен находиться в директории,
+        По умолчанию загружается файл ingredients.csv из директории,
         указанной в настройках (LOAD_DATA_DIR).
 
         Пример содержимого файла ingredients.csv:
@@ -28,27 +126,116 @@ class Command(BaseCommand):
         "Мука","г"
         ...
 
-        Каждая строка файла содержит имя ингредиента и его единицу измерения,
-        разделенные запятой. Первая колонка - имя ингредиента,
-        вторая колонка - единица измерения.
+        Пример содержимого файла ingredients.json:
+        [{"name": "Молоко", "measurement_unit": "мл"}, ...]
 
-        После успешного выполнения команды, все ингредиенты
-        будут добавлены в базу данных.
+        Файл читается потоково и загружается пачками, поэтому
+        расход памяти не зависит от размера файла. Каждая пачка
+        сохраняется в своей транзакции, чтобы загрузка большого файла
+        не держала одну длинную транзакцию. Уже существующие
+        ингредиенты пропускаются, так что после ошибки команду можно
+        просто запустить повторно. На PostgreSQL пачка загружается
+        через COPY во временную таблицу и переносится одним
+        INSERT ... ON CONFLICT.
         """
-        # Открываем CSV-файл для чтения
-        with open(
-            f'{LOAD_DATA_DIR}/ingredients.csv',
-            encoding='utf-8',
-        ) as csvfile:
-            reader = csv.reader(csvfile)
-            # Создаем временный список с объектами Ingredient
-            temp_data = [Ingredient(
-                name=row[0],  # Имя ингредиента из первой колонки CSV
-                measurement_unit=row[1],  # Единица измерения
-            ) for row in reader]
-            # Массово добавляем ингредиенты в базу данных
-            Ingredient.objects.bulk_create(temp_data)
-            # Выводим сообщение об успешной загрузке
-            self.stdout.write(self.style.SUCCESS(
-                'Ингредиенты были загружены в базу данных!')
+        path = options['file']
+        file_format = options['format'] or os.path.splitext(
+            path,
+        )[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла: {file_format or path}.'
+            )
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть положительным.')
+        use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+
+        started = time.monotonic()
+        processed = 0
+        try:
+            # newline='' нужен модулю csv: поля в кавычках могут
+            # содержать переводы строк.
+            file = open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть файл: {error}.')
+        with file:
+            rows = (
+                (name.strip(), measurement_unit.strip())
+                for name, measurement_unit in READERS[file_format](file)
+                if name.strip() and measurement_unit.strip()
+            )
+            if use_copy:
+                self.create_staging_table()
+            try:
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    with transaction.atomic():
+                        if use_copy:
+                            self.copy_batch(batch)
+                        else:
+                            self.insert_batch(batch)
+                        # bulk_create и COPY не отправляют сигналы,
+                        # сбрасываем версию сами
+                        bump_version('ingredient')
+                    processed += len(batch)
+                    self.report_progress(processed, started)
+            except (csv.Error, UnicodeDecodeError) as error:
+                raise CommandError(f'Не удалось прочитать файл: {error}.')
+            finally:
+                if use_copy:
+                    self.drop_staging_table()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты были загружены в базу данных! '
+            f'Обработано строк: {processed}.'
+        ))
+
+    def insert_batch(self, batch):
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in batch
+            ),
+            ignore_conflicts=True,
+        )
+
+    def create_staging_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name varchar(200), measurement_unit varchar(200))'
             )
+
+    def drop_staging_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS ingredient_import')
+
+    def copy_batch(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            cursor.execute('TRUNCATE ingredient_import')
+
+    def report_progress(self, processed, started):
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Обработано строк: {processed} ({rate:.0f} строк/с)'
+        )
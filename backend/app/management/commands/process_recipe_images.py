@@ -0,0 +1,42 @@
+from django.core.management import BaseCommand
+
+from app.images import process_recipe_image
+from app.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Команда для создания уменьшенных копий изображений рецептов,
+    которые ещё не были обработаны.
+    """
+
+    help = 'Создаёт уменьшенные копии изображений рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Обработать заново изображения всех рецептов.',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Обработчик команды.
+
+        Использование команды:
+        python manage.py process_recipe_images [--all]
+
+        Без флага --all обрабатываются только рецепты, копии изображений
+        которых ещё не готовы (например, после перезапуска сервера или
+        для рецептов, созданных до появления копий).
+        """
+        recipes = Recipe.objects.all()
+        if not options['all']:
+            recipes = recipes.exclude(image_status=Recipe.ImageStatus.READY)
+        processed = 0
+        for recipe_id in recipes.values_list('pk', flat=True).iterator():
+            process_recipe_image(recipe_id)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}.'
+        ))
@@ -0,0 +1,59 @@
+from django.core.management import BaseCommand, CommandError
+
+from app import shopping_list
+
+
+class Command(BaseCommand):
+    """
+    Команда для сверки и пересборки списков покупок
+    (таблица ShoppingListItem) по корзинам пользователей.
+    """
+
+    help = 'Сверяет и пересобирает списки покупок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить списки с корзинами, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            nargs='+',
+            dest='user_ids',
+            help='Ограничиться указанными id пользователей.',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Обработчик команды.
+
+        Использование команды:
+        python manage.py rebuild_shopping_lists [--check] [--user ID ...]
+
+        С флагом --check команда выводит расхождения между сохранёнными
+        списками и суммой ингредиентов рецептов в корзинах и завершается
+        с ошибкой, если они есть. Без флага списки пересобираются.
+        """
+        user_ids = options['user_ids']
+        if not options['check']:
+            shopping_list.rebuild(user_ids)
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок пересобраны.'
+            ))
+            return
+
+        inconsistencies = shopping_list.find_inconsistencies(user_ids)
+        for user_id, ingredient_id, expected, stored in inconsistencies:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'ожидается {expected}, сохранено {stored}'
+            )
+        if inconsistencies:
+            raise CommandError(
+                f'Найдено расхождений: {len(inconsistencies)}.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Списки покупок совпадают с корзинами.'
+        ))
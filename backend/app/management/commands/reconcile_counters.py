@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand
+
+from app import counters
+
+
+class Command(BaseCommand):
+    """
+    Команда для сверки денормализованных счётчиков рецептов
+    и пользователей с данными связанных таблиц.
+    """
+
+    help = 'Исправляет расхождения в счётчиках рецептов и пользователей.'
+
+    def handle(self, *args, **options):
+        """
+        Обработчик команды.
+
+        Использование команды:
+        python manage.py reconcile_counters
+
+        Счётчики (избранное и корзины рецепта, рецепты и подписчики
+        пользователя) обновляются сигналами моделей и запросами
+        app.user_lists, в том числе при действиях из админки и
+        каскадных удалениях. Массовые запросы в обход моделей
+        (QuerySet.update, bulk_create, SQL вручную) их не меняют,
+        поэтому команду стоит запускать периодически; она
+        пересчитывает только разошедшиеся значения.
+        """
+        for counter, fixed in counters.reconcile().items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены.'))
@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+
+from app.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчёта поисковых векторов рецептов.
+    """
+
+    help = 'Пересчитывает поисковые векторы всех рецептов.'
+
+    def handle(self, *args, **options):
+        """
+        Обработчик команды.
+
+        Использование команды:
+        python manage.py update_search_vectors
+
+        API обновляет векторы при создании и изменении рецептов.
+        Команда нужна после правок через админку и переименования
+        ингредиентов. Работает только на PostgreSQL.
+        """
+        update_search_vectors()
+        self.stdout.write(self.style.SUCCESS('Поисковые векторы обновлены.'))
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_shopping_list_items(apps, schema_editor):
+    ShoppingCart = apps.get_model('app', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('app', 'ShoppingListItem')
+    rows = ShoppingCart.objects.values_list(
+        'user_id', 'recipe__ingredient_in_recipes__ingredient_id',
+    ).annotate(
+        total=Sum('recipe__ingredient_in_recipes__amount'),
+    ).order_by()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id,
+            ingredient_id=ingredient_id,
+            amount=total,
+        )
+        for user_id, ingredient_id, total in rows
+        if ingredient_id is not None
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='общее количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='app.ingredient', verbose_name='ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'позиция списка покупок',
+                'verbose_name_plural': 'позиции списка покупок',
+                'ordering': ('user',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_item'),
+        ),
+        migrations.RunPython(
+            fill_shopping_list_items,
+            migrations.RunPython.noop,
+        ),
+    ]
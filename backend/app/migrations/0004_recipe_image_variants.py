@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('pending', 'ожидает обработки'), ('ready', 'обработано'), ('failed', 'ошибка обработки')], default='pending', editable=False, max_length=16, verbose_name='статус обработки изображения'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='уменьшенные копии изображения'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+import app.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=app.fields.ContentHashImageField(upload_to='images/', verbose_name='изображение'),
+        ),
+    ]
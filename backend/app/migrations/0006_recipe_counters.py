@@ -0,0 +1,48 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('app', 'Recipe', 'favorites_count', 'Favourite', 'recipe'),
+    ('app', 'Recipe', 'shopping_carts_count', 'ShoppingCart', 'recipe'),
+    ('users', 'User', 'recipes_count', 'Recipe', 'author'),
+    ('users', 'User', 'followers_count', 'Follow', 'following'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app_label, model_name, field, related_name, related_field in COUNTERS:
+        model = apps.get_model(app_label, model_name)
+        related_model = apps.get_model('app', related_name)
+        model.objects.update(**{field: Coalesce(
+            Subquery(
+                related_model.objects.filter(
+                    **{related_field: OuterRef('pk')},
+                ).order_by().values(related_field).annotate(
+                    count=Count('pk'),
+                ).values('count')
+            ),
+            0,
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_alter_recipe_image'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='количество добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='количество добавлений в корзину'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
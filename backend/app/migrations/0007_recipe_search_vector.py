@@ -0,0 +1,62 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+FILL_VECTORS = """
+UPDATE app_recipe AS recipe SET search_vector =
+    setweight(to_tsvector('russian', coalesce(recipe.name, '')), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM app_ingredientinrecipe AS item
+        JOIN app_ingredient AS ingredient ON ingredient.id = item.ingredient_id
+        WHERE item.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', coalesce(recipe.text, '')), 'C')
+"""
+
+
+class AddPostgreSQLIndex(migrations.AddIndex):
+    """
+    AddIndex, который создаёт индекс только на PostgreSQL: GIN-индекс
+    и tsvector есть только там. Состав моделей меняется на всех СУБД.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state,
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state,
+            )
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(FILL_VECTORS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='поисковый вектор'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        AddPostgreSQLIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='app_recipe_search_vector_gin'),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from app.fields import ContentHashImageField
 from app.validators import validate_HEX_format
 
 User = get_user_model()
@@ -74,9 +77,73 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов для рецептов."""
+
+    def with_related(self):
+        """
+        Подгружает автора, теги и ингредиенты рецепта
+        фиксированным числом запросов, независимо от размера выборки.
+        """
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'ingredient_in_recipes',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient',
+                ).order_by('pk'),
+            ),
+        )
+
+    def limited_per_author(self, limit):
+        """
+        Оставляет не больше limit первых рецептов каждого автора
+        одним запросом с коррелированным подзапросом.
+        """
+        return self.filter(
+            pk__in=models.Subquery(
+                Recipe.objects.filter(
+                    author=models.OuterRef('author'),
+                ).values('pk')[:limit]
+            ),
+        )
+
+    def with_user_flags(self, user):
+        """
+        Аннотирует признаки is_favorited и is_in_shopping_cart
+        для пользователя подзапросами EXISTS по рецептам выборки.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField(),
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField(),
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favourite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk'),
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef('pk'),
+                )
+            ),
+        )
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
 
+    class ImageStatus(models.TextChoices):
+        PENDING = 'pending', _('ожидает обработки')
+        READY = 'ready', _('обработано')
+        FAILED = 'failed', _('ошибка обработки')
+
     author = models.ForeignKey(
         to=User,
         on_delete=models.CASCADE,
@@ -87,10 +154,23 @@ class Recipe(models.Model):
         max_length=200,
         verbose_name=_('название рецепта'),
     )
-    image = models.ImageField(
+    image = ContentHashImageField(
         upload_to='images/',
         verbose_name=_('изображение'),
     )
+    image_status = models.CharField(
+        max_length=16,
+        choices=ImageStatus.choices,
+        default=ImageStatus.PENDING,
+        editable=False,
+        verbose_name=_('статус обработки изображения'),
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name=_('уменьшенные копии изображения'),
+    )
     text = models.TextField(verbose_name=_('описание рецепта'))
     ingredients = models.ManyToManyField(
         to=Ingredient,
@@ -113,11 +193,38 @@ class Recipe(models.Model):
             ),
         ),
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('количество добавлений в избранное'),
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('количество добавлений в корзину'),
+    )
+    # Заполняется app.search.update_search_vectors при сохранении
+    # через API и админку; после изменений в обход них нужно запустить
+    # команду update_search_vectors. GIN-индекс (см. Meta.indexes)
+    # миграция создаёт только на PostgreSQL.
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name=_('поисковый вектор'),
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = _('рецепт')
         verbose_name_plural = _('рецепты')
         ordering = ('name',)
+        indexes = (
+            GinIndex(
+                fields=('search_vector',),
+                name='app_recipe_search_vector_gin',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -285,3 +392,43 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в корзину'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Позиция списка покупок пользователя: суммарное количество
+    ингредиента по всем рецептам в его корзине.
+
+    Таблица поддерживается инкрементально (см. app.shopping_list)
+    и сверяется с корзиной командой rebuild_shopping_lists.
+    """
+
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name=_('пользователь'),
+    )
+    ingredient = models.ForeignKey(
+        to=Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name=_('ингредиент'),
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name=_('общее количество'),
+    )
+
+    class Meta:
+        verbose_name = _('позиция списка покупок')
+        verbose_name_plural = _('позиции списка покупок')
+        ordering = ('user',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
@@ -0,0 +1,113 @@
+from collections import defaultdict
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection
+from django.db.models import (
+    Case,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    TextField,
+    Value,
+    When,
+)
+
+from app.models import IngredientInRecipe, Recipe
+from app.utils import normalize
+
+# Конфигурация полнотекстового поиска PostgreSQL.
+SEARCH_CONFIG = 'russian'
+
+
+def get_search_vector():
+    """
+    Выражение поискового вектора рецепта: название (вес A),
+    названия ингредиентов (вес B) и описание (вес C).
+    """
+    ingredient_names = Subquery(
+        IngredientInRecipe.objects.filter(
+            recipe=OuterRef('pk'),
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', delimiter=' '),
+        ).values('names'),
+        output_field=TextField(),
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids=None):
+    """
+    Пересчитывает поисковые векторы рецептов одним запросом UPDATE.
+    Вне PostgreSQL векторы не используются.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    recipes.update(search_vector=get_search_vector())
+
+
+def search_recipes(queryset, text):
+    """
+    Отбирает рецепты по тексту и упорядочивает по релевантности.
+
+    На PostgreSQL используется поисковый вектор с GIN-индексом
+    и SearchRank. На других СУБД (например, SQLite в тестах) поиск
+    выполняется в памяти процесса по вхождению подстроки.
+
+    Пагинация по курсору (?cursor) упорядочивает выборку по pk,
+    поэтому в ней порядок по релевантности не сохраняется.
+    """
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            text,
+            config=SEARCH_CONFIG,
+            search_type='websearch',
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query),
+        ).order_by('-rank', 'pk')
+    return _search_in_process(queryset, text)
+
+
+def _search_in_process(queryset, text):
+    """
+    Запасной поиск для СУБД без полнотекстового поиска. Совпадения
+    ищутся в памяти процесса, потому что LIKE в SQLite не учитывает
+    регистр кириллицы. Ранг: 3 - совпадение в названии,
+    2 - в ингредиентах, 1 - в описании.
+    """
+    query = normalize(text)
+    ingredient_names = defaultdict(list)
+    for recipe_id, name in IngredientInRecipe.objects.filter(
+        recipe__in=queryset.values('pk'),
+    ).values_list('recipe_id', 'ingredient__name'):
+        ingredient_names[recipe_id].append(normalize(name))
+    ranks = {}
+    for pk, name, description in queryset.values_list('pk', 'name', 'text'):
+        if query in normalize(name):
+            ranks[pk] = 3
+        elif any(query in name for name in ingredient_names[pk]):
+            ranks[pk] = 2
+        elif query in normalize(description):
+            ranks[pk] = 1
+    if not ranks:
+        return queryset.none()
+    return queryset.filter(pk__in=ranks).annotate(
+        rank=Case(
+            *(When(pk=pk, then=Value(rank)) for pk, rank in ranks.items()),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    ).order_by('-rank', 'pk')
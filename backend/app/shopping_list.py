@@ -0,0 +1,265 @@
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from app.models import (
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+
+User = get_user_model()
+
+
+def get_recipe_ingredients(recipe_id):
+    """Возвращает словарь {id ингредиента: количество} для рецепта."""
+    return dict(
+        IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id,
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+def lock_recipes(recipe_ids):
+    """
+    Блокирует строки рецептов до конца транзакции. Состав рецепта
+    читается и меняется только под этой блокировкой, поэтому
+    добавление рецепта в корзину не прочитает состав, изменение
+    которого ещё не перенесено в списки покупок. Рецепты блокируются
+    раньше пользователей (см. apply_deltas) и по порядку id,
+    чтобы не было взаимных блокировок.
+    """
+    if not connection.features.has_select_for_update:
+        return
+    list(
+        Recipe.objects.select_for_update().filter(
+            pk__in=recipe_ids,
+        ).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def lock_users(user_ids):
+    """
+    Блокирует строки пользователей до конца транзакции, чтобы
+    параллельные изменения одного списка покупок выполнялись
+    последовательно.
+    """
+    list(
+        User.objects.select_for_update().filter(
+            pk__in=user_ids,
+        ).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+@transaction.atomic(savepoint=False)
+def apply_deltas(deltas):
+    """
+    Применяет изменения {(id пользователя, id ингредиента): дельта}
+    к спискам покупок. Позиции с нулевым количеством удаляются.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    user_ids = {user_id for user_id, _ in deltas}
+    ingredient_ids = {ingredient_id for _, ingredient_id in deltas}
+    lock_users(user_ids)
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.filter(
+            user_id__in=user_ids,
+            ingredient_id__in=ingredient_ids,
+        )
+    }
+    to_create, to_update, to_delete = [], [], []
+    for (user_id, ingredient_id), delta in deltas.items():
+        item = items.get((user_id, ingredient_id))
+        if item is None:
+            if delta > 0:
+                to_create.append(ShoppingListItem(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    amount=delta,
+                ))
+            continue
+        item.amount += delta
+        if item.amount > 0:
+            to_update.append(item)
+        else:
+            to_delete.append(item.pk)
+    ShoppingListItem.objects.bulk_create(to_create)
+    ShoppingListItem.objects.bulk_update(to_update, ('amount',))
+    ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+
+
+def _add_recipes_sql(user_id, recipe_ids, sign):
+    """
+    Меняет список покупок на PostgreSQL одним запросом, не читая его:
+    INSERT ... ON CONFLICT DO UPDATE при добавлении рецептов, DELETE
+    и UPDATE позиций в одном запросе при удалении.
+    """
+    quote_name = connection.ops.quote_name
+    items = quote_name(ShoppingListItem._meta.db_table)
+    totals = (
+        f'SELECT ingredient_id, SUM(amount) AS total '
+        f'FROM {quote_name(IngredientInRecipe._meta.db_table)} '
+        f'WHERE recipe_id = ANY(%s) GROUP BY ingredient_id'
+    )
+    with connection.cursor() as cursor:
+        if sign > 0:
+            cursor.execute(
+                f'INSERT INTO {items} (user_id, ingredient_id, amount) '
+                f'SELECT %s, ingredient_id, total FROM ({totals}) totals '
+                f'ORDER BY ingredient_id '
+                f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {items}.amount + EXCLUDED.amount',
+                (user_id, list(recipe_ids)),
+            )
+            return
+        # Обе части запроса видят одни и те же строки, поэтому позиции
+        # делятся на удаляемые и уменьшаемые условием по количеству.
+        cursor.execute(
+            f'WITH totals AS ({totals}), removed AS ('
+            f'DELETE FROM {items} USING totals '
+            f'WHERE {items}.user_id = %s '
+            f'AND {items}.ingredient_id = totals.ingredient_id '
+            f'AND {items}.amount <= totals.total) '
+            f'UPDATE {items} SET amount = {items}.amount - totals.total '
+            f'FROM totals WHERE {items}.user_id = %s '
+            f'AND {items}.ingredient_id = totals.ingredient_id '
+            f'AND {items}.amount > totals.total',
+            (list(recipe_ids), user_id, user_id),
+        )
+
+
+@transaction.atomic(savepoint=False)
+def add_recipes(user_id, recipe_ids, sign=1, locked=False):
+    """
+    Добавляет ингредиенты рецептов в список покупок пользователя.
+    locked=True означает, что рецепты уже заблокированы вызывающим
+    кодом (см. lock_recipes).
+    """
+    if not recipe_ids:
+        return
+    if not locked:
+        lock_recipes(recipe_ids)
+    if connection.vendor == 'postgresql':
+        lock_users((user_id,))
+        _add_recipes_sql(user_id, recipe_ids, sign)
+        return
+    rows = IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).values_list('ingredient_id').annotate(total=Sum('amount')).order_by()
+    apply_deltas({
+        (user_id, ingredient_id): sign * total
+        for ingredient_id, total in rows
+    })
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Убирает ингредиенты рецептов из списка покупок пользователя."""
+    add_recipes(user_id, recipe_ids, sign=-1)
+
+
+def change_recipe(recipe_id, old_ingredients, new_ingredients):
+    """
+    Переносит изменение состава рецепта в списки покупок всех
+    пользователей, у которых рецепт лежит в корзине. Старый состав
+    должен быть прочитан под блокировкой рецепта (lock_recipes).
+    """
+    changes = {
+        ingredient_id: (
+            new_ingredients.get(ingredient_id, 0)
+            - old_ingredients.get(ingredient_id, 0)
+        )
+        for ingredient_id in old_ingredients.keys() | new_ingredients.keys()
+    }
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    user_ids = ShoppingCart.objects.filter(
+        recipe_id=recipe_id,
+    ).values_list('user_id', flat=True)
+    apply_deltas({
+        (user_id, ingredient_id): delta
+        for user_id in user_ids
+        for ingredient_id, delta in changes.items()
+    })
+
+
+@contextmanager
+def track_recipes(recipe_ids):
+    """
+    Переносит в списки покупок изменения состава рецептов, сделанные
+    внутри блока в обход API, например из админки.
+    """
+    recipe_ids = set(recipe_ids) - {None}
+    with transaction.atomic():
+        lock_recipes(recipe_ids)
+        old = {pk: get_recipe_ingredients(pk) for pk in recipe_ids}
+        yield
+        for pk in recipe_ids:
+            change_recipe(pk, old[pk], get_recipe_ingredients(pk))
+
+
+def get_expected_items(user_ids=None):
+    """
+    Считает списки покупок по корзинам соединением таблиц и возвращает
+    словарь {(id пользователя, id ингредиента): количество}.
+    """
+    carts = ShoppingCart.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user__in=user_ids)
+    rows = carts.values_list(
+        'user_id', 'recipe__ingredient_in_recipes__ingredient_id',
+    ).annotate(
+        total=Sum('recipe__ingredient_in_recipes__amount'),
+    ).order_by()
+    return {(user_id, ingredient_id): total
+            for user_id, ingredient_id, total in rows
+            if ingredient_id is not None}
+
+
+def get_stored_items(user_ids=None):
+    """Возвращает сохранённые позиции списков покупок."""
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user__in=user_ids)
+    rows = items.values_list('user_id', 'ingredient_id', 'amount')
+    return {(user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in rows}
+
+
+def find_inconsistencies(user_ids=None):
+    """
+    Сверяет сохранённые списки покупок с корзинами и возвращает
+    список (id пользователя, id ингредиента, ожидается, сохранено).
+    """
+    expected = get_expected_items(user_ids)
+    stored = get_stored_items(user_ids)
+    return sorted(
+        (*key, expected.get(key), stored.get(key))
+        for key in expected.keys() | stored.keys()
+        if expected.get(key) != stored.get(key)
+    )
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Пересобирает списки покупок по корзинам пользователей."""
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user__in=user_ids)
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id,
+            ingredient_id=ingredient_id,
+            amount=amount,
+        )
+        for (user_id, ingredient_id), amount in get_expected_items(
+            user_ids,
+        ).items()
+    )
@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from app.models import (
+    Favourite,
+    Follow,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+    TagForRecipe,
+)
+from app import counters, shopping_list
+from app.images import schedule_image_cleanup
+from app.versions import bump_recipe_version, bump_version
+
+User = get_user_model()
+
+# Поля рецепта, от которых зависят состав и порядок списков рецептов:
+# сортировка, фильтр по автору и полнотекстовый поиск.
+LISTING_FIELDS = {'name', 'text', 'author', 'author_id'}
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(**kwargs):
+    """Сбрасывает версию справочника ингредиентов."""
+    bump_version('ingredient')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(**kwargs):
+    """Сбрасывает версию справочника тегов."""
+    bump_version('tag')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(instance, created=False, update_fields=None, **kwargs):
+    """
+    Сбрасывает версию рецепта, а общую версию списка рецептов — только
+    при создании, удалении и изменении полей из LISTING_FIELDS.
+    """
+    bump_recipe_version(instance.pk, listing=(
+        created
+        or kwargs['signal'] is post_delete
+        or update_fields is None
+        or not LISTING_FIELDS.isdisjoint(update_fields)
+    ))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(instance, **kwargs):
+    """
+    Убирает ингредиенты удаляемого рецепта из списков покупок.
+    Рецепт может удаляться каскадно вместе с автором или из админки,
+    поэтому это делается сигналом, а не во view.
+    """
+    shopping_list.lock_recipes((instance.pk,))
+    shopping_list.change_recipe(
+        instance.pk,
+        shopping_list.get_recipe_ingredients(instance.pk),
+        {},
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    """Удаляет изображение рецепта, если оно больше никому не нужно."""
+    schedule_image_cleanup(instance.image.name)
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+@receiver((post_save, post_delete), sender=TagForRecipe)
+def recipe_item_changed(instance, **kwargs):
+    """
+    Сбрасывает версии рецепта и списка рецептов при изменении
+    ингредиентов и тегов рецепта: от них зависят фильтр по тегам
+    и полнотекстовый поиск.
+    """
+    bump_recipe_version(instance.recipe_id)
+
+
+@receiver((post_save, post_delete), sender=Favourite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+def user_lists_changed(instance, **kwargs):
+    """
+    Сбрасывает версию избранного, корзины и подписок пользователя:
+    от них зависят признаки is_favorited, is_in_shopping_cart
+    и is_subscribed в ответах.
+    """
+    bump_version('user-lists', instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Favourite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+@receiver((post_save, post_delete), sender=Recipe)
+def counted_object_changed(instance, created=False, raw=False, **kwargs):
+    """
+    Обновляет счётчики (см. app.counters) при создании и удалении
+    объекта, в том числе из админки и каскадом. Запросы в обход
+    моделей (bulk_create, raw SQL в app.user_lists) меняют счётчики
+    сами; фикстуры загружаются вместе со значениями счётчиков.
+    """
+    if kwargs['signal'] is post_delete:
+        counters.change_related_counters(instance, -1)
+    elif created and not raw:
+        counters.change_related_counters(instance, 1)
+
+
+@receiver(post_save, sender=User)
+def profile_changed(instance, created=False, update_fields=None,
+                    **kwargs):
+    """
+    Сбрасывает версии рецептов пользователя, если изменились поля,
+    которые выводятся в профиле автора (User.PROFILE_FIELDS).
+    Остальные сохранения (вход, смена пароля) и регистрация, когда
+    рецептов ещё нет, пропускаются; рецепты удалённого пользователя
+    удаляются каскадом и сбрасывают версии сами.
+    """
+    if created or kwargs['raw']:
+        return
+    fields = instance.get_changed_profile_fields()
+    if update_fields is not None:
+        fields &= set(update_fields)
+    if not fields:
+        return
+    recipe_ids = Recipe.objects.filter(
+        author=instance,
+    ).values_list('pk', flat=True)
+    for recipe_id in recipe_ids:
+        bump_recipe_version(recipe_id, listing=False)
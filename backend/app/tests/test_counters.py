@@ -0,0 +1,183 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from app import counters
+from app.models import Favourite, Follow, Recipe, ShoppingCart
+from api.tests.utils import (
+    create_ingredients,
+    create_recipe,
+    create_tags,
+    create_user,
+    get_client,
+)
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class CountersTestCase(TestCase):
+    """Автор с рецептами, читатель и проверка счётчиков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.reader = create_user(1)
+        tags = create_tags(1)
+        ingredients = create_ingredients(2)
+        cls.first = create_recipe(cls.author, tags, ingredients, name='1')
+        cls.second = create_recipe(cls.author, tags, ingredients, name='2')
+
+    def setUp(self):
+        self.client = get_client(self.reader)
+
+    def assertCounters(self, recipe, favorites, carts):
+        recipe.refresh_from_db()
+        self.assertEqual(
+            (recipe.favorites_count, recipe.shopping_carts_count),
+            (favorites, carts),
+        )
+
+    def assertUserCounters(self, user, recipes, followers):
+        user.refresh_from_db()
+        self.assertEqual(
+            (user.recipes_count, user.followers_count),
+            (recipes, followers),
+        )
+
+    def assertConsistent(self):
+        self.assertEqual(set(counters.reconcile().values()), {0})
+
+
+class CountersTests(CountersTestCase):
+    """Счётчики меняются при действиях через API, ORM и каскадом."""
+
+    def test_user_lists(self):
+        for action in ('favorite', 'shopping_cart'):
+            response = self.client.post(
+                f'/api/recipes/{self.first.pk}/{action}/',
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertCounters(self.first, 1, 1)
+        response = self.client.delete(
+            f'/api/recipes/{self.first.pk}/favorite/',
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertCounters(self.first, 0, 1)
+        self.assertConsistent()
+
+    def test_follow(self):
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertUserCounters(self.author, 2, 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertUserCounters(self.author, 2, 0)
+        self.assertConsistent()
+
+    def test_recipes(self):
+        self.assertUserCounters(self.author, 2, 0)
+        response = get_client(self.author).delete(
+            f'/api/recipes/{self.first.pk}/',
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertUserCounters(self.author, 1, 0)
+        self.assertConsistent()
+
+    def test_cascade_delete(self):
+        Favourite.objects.create(user=self.reader, recipe=self.first)
+        ShoppingCart.objects.create(user=self.reader, recipe=self.second)
+        Follow.objects.create(user=self.reader, following=self.author)
+        self.assertCounters(self.first, 1, 0)
+        self.assertCounters(self.second, 0, 1)
+        self.assertUserCounters(self.author, 2, 1)
+        self.reader.delete()
+        self.assertCounters(self.first, 0, 0)
+        self.assertCounters(self.second, 0, 0)
+        self.assertUserCounters(self.author, 2, 0)
+        self.assertConsistent()
+
+
+class CountersAdminTests(CountersTestCase):
+    """Изменения из админки, включая массовое удаление."""
+
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='password-12345',
+        )
+        self.admin_client = self.client_class()
+        self.admin_client.force_login(admin)
+
+    def test_change_and_delete_selected(self):
+        response = self.admin_client.post(
+            reverse('admin:app_favourite_add'),
+            {'user': self.reader.pk, 'recipe': self.first.pk},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(self.first, 1, 0)
+        favourite = Favourite.objects.get()
+        response = self.admin_client.post(
+            reverse('admin:app_favourite_change', args=(favourite.pk,)),
+            {'user': self.reader.pk, 'recipe': self.second.pk},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(self.first, 0, 0)
+        self.assertCounters(self.second, 1, 0)
+        Favourite.objects.create(user=self.author, recipe=self.second)
+        self.assertCounters(self.second, 2, 0)
+        response = self.admin_client.post(
+            reverse('admin:app_favourite_changelist'),
+            {
+                'action': 'delete_selected',
+                'post': 'yes',
+                '_selected_action': list(
+                    Favourite.objects.values_list('pk', flat=True),
+                ),
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(self.second, 0, 0)
+        self.assertConsistent()
+
+
+class ReconcileTests(CountersTestCase):
+    """Сверка счётчиков с данными связанных таблиц."""
+
+    def test_reconcile(self):
+        Favourite.objects.create(user=self.reader, recipe=self.first)
+        Recipe.objects.update(favorites_count=5, shopping_carts_count=0)
+        User.objects.filter(pk=self.author.pk).update(recipes_count=0)
+        self.assertEqual(counters.reconcile(), {
+            'app.Recipe.favorites_count': 2,
+            'app.Recipe.shopping_carts_count': 0,
+            'users.User.recipes_count': 1,
+            'users.User.followers_count': 0,
+        })
+        self.assertCounters(self.first, 1, 0)
+        self.assertCounters(self.second, 0, 0)
+        self.assertUserCounters(self.author, 2, 0)
+        self.assertConsistent()
+
+    def test_command(self):
+        Recipe.objects.filter(pk=self.first.pk).update(shopping_carts_count=3)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn(
+            'app.Recipe.shopping_carts_count: исправлено 1', out.getvalue(),
+        )
+        self.assertCounters(self.first, 0, 0)
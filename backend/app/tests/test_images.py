@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import skipUnless
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from app.images import delete_unused_image
+from app.models import Recipe
+from api.tests.utils import IMAGE, create_recipe, create_user
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class DeleteUnusedImageTests(TestCase):
+    """Удаление неиспользуемых изображений."""
+
+    def test_referenced_image_is_kept(self):
+        recipe = create_recipe(create_user(0), [], [])
+        delete_unused_image(recipe.image.name)
+        self.assertTrue(default_storage.exists(recipe.image.name))
+
+    def test_unused_image_is_deleted(self):
+        recipe = create_recipe(create_user(0), [], [])
+        name = recipe.image.name
+        Recipe.objects.filter(pk=recipe.pk).update(image='other.png')
+        delete_unused_image(name)
+        self.assertFalse(default_storage.exists(name))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Нужен PostgreSQL.')
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class DeleteUnusedImageRaceTests(TransactionTestCase):
+    """Удаление файла, который повторно использует новый рецепт."""
+
+    def test_reused_image_is_not_deleted_before_commit(self):
+        author = create_user(0)
+        name = create_recipe(author, [], []).image.name
+        Recipe.objects.update(image='other.png')
+        saved = threading.Event()
+        release = threading.Event()
+
+        def create():
+            try:
+                with transaction.atomic():
+                    recipe = Recipe(
+                        author=author, name='Копия', text='Описание',
+                        cooking_time=5,
+                    )
+                    recipe.image.save('copy.png', ContentFile(IMAGE))
+                    saved.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        def delete():
+            try:
+                delete_unused_image(name)
+            finally:
+                connection.close()
+
+        creator = threading.Thread(target=create)
+        creator.start()
+        saved.wait(5)
+        deleter = threading.Thread(target=delete)
+        deleter.start()
+        time.sleep(0.3)
+        # Удаление ждёт коммита рецепта, который использует файл.
+        self.assertTrue(deleter.is_alive())
+        release.set()
+        creator.join(5)
+        deleter.join(5)
+        self.assertTrue(Recipe.objects.filter(image=name).exists())
+        self.assertTrue(default_storage.exists(name))
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from app.models import Ingredient
+
+INGREDIENTS = [
+    ('Молоко', 'мл'),
+    ('Сахар', 'г'),
+    ('Мука, пшеничная', 'г'),
+    ('Соль "Экстра"', 'г'),
+]
+
+
+class ImportMixin:
+    """Временная директория для файлов с ингредиентами."""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            file.write(content)
+        return path
+
+    def write_csv(self, rows):
+        return self.write('ingredients.csv', ''.join(
+            '"{}","{}"\n'.format(*(value.replace('"', '""') for value in row))
+            for row in rows
+        ))
+
+    def write_json(self, rows, name='ingredients.json'):
+        return self.write(name, json.dumps([
+            {'name': name, 'measurement_unit': unit} for name, unit in rows
+        ], ensure_ascii=False))
+
+    def call(self, path, *args):
+        call_command(
+            'import_ingredients_csv', '--file', path, *args,
+            stdout=StringIO(),
+        )
+
+    def assertIngredients(self, expected):
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            set(expected),
+        )
+
+
+class ImportIngredientsTests(ImportMixin, TestCase):
+    """Загрузка ингредиентов из CSV и JSON."""
+
+    def test_csv(self):
+        path = self.write_csv(INGREDIENTS + [('', 'г'), (' Сахар ', 'г')])
+        for args in ((), ('--no-copy',), ('--batch-size', '1')):
+            with self.subTest(args=args):
+                self.call(path, *args)
+                self.assertIngredients(INGREDIENTS)
+
+    def test_json(self):
+        path = self.write_json(INGREDIENTS)
+        # Маленькие куски проверяют дочитывание объектов на границах
+        with mock.patch(
+            'app.management.commands.import_ingredients_csv.'
+            'JSON_CHUNK_SIZE', 7,
+        ):
+            self.call(path, '--batch-size', '3')
+        self.assertIngredients(INGREDIENTS)
+
+    def test_format_option(self):
+        path = self.write('ingredients.txt', 'Молоко,мл\n')
+        self.call(path, '--format', 'csv')
+        self.assertIngredients([('Молоко', 'мл')])
+
+    def test_malformed_input(self):
+        cases = (
+            ('ingredients.json', '{"name": "Молоко"}', 'массив'),
+            ('ingredients.json', '[{"name": "Молоко", ', 'конец'),
+            ('ingredients.json', '[{"name": "Молоко"}, ["Сахар", "г"]]',
+             'Элемент 2'),
+            ('ingredients.json', '[{"name": 1, "measurement_unit": "г"}]',
+             'строками'),
+            ('ingredients.xml', '', 'формат'),
+        )
+        for name, content, message in cases:
+            with self.subTest(content=content):
+                path = self.write(name, content)
+                with self.assertRaisesMessage(CommandError, message):
+                    self.call(path)
+        with self.assertRaisesMessage(CommandError, 'открыть'):
+            self.call(os.path.join(self.directory, 'missing.csv'))
+        with self.assertRaisesMessage(CommandError, 'пачки'):
+            self.call(self.write_csv(INGREDIENTS), '--batch-size', '0')
+        self.assertIngredients([])
+
+
+class ImportIngredientsBatchTests(ImportMixin, TransactionTestCase):
+    """Пачки сохраняются в отдельных транзакциях."""
+
+    def test_batches_are_committed(self):
+        path = self.write(
+            'ingredients.json',
+            '[{"name": "Молоко", "measurement_unit": "мл"}, '
+            '{"name": "Сахар", "measurement_unit": "г"}, 1]',
+        )
+        with self.assertRaises(CommandError):
+            self.call(path, '--batch-size', '1')
+        self.assertIngredients(INGREDIENTS[:2])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT to_regclass('pg_temp.ingredient_import')"
+                )
+                self.assertIsNone(cursor.fetchone()[0])
@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from app.models import Ingredient, Recipe
+from app.search import (
+    _search_in_process,
+    search_recipes,
+    update_search_vectors,
+)
+from api.tests.utils import (
+    create_ingredients,
+    create_recipe,
+    create_tags,
+    create_user,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class SearchRecipesTests(TestCase):
+    """Поиск рецептов по названию, ингредиентам и описанию."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user(0)
+        tags = create_tags(1)
+        pumpkin, other = create_ingredients(2)
+        Ingredient.objects.filter(pk=pumpkin.pk).update(name='Тыква')
+        cls.by_text = create_recipe(author, tags, (other,), name='Каша')
+        Recipe.objects.filter(pk=cls.by_text.pk).update(text='Сладкая тыква')
+        cls.by_ingredient = create_recipe(author, tags, (pumpkin,), name='Суп')
+        cls.by_name = create_recipe(author, tags, (other,), name='Тыква')
+        create_recipe(author, tags, (other,), name='Салат')
+        update_search_vectors()
+
+    def search(self, function, text):
+        return list(function(Recipe.objects.all(), text))
+
+    def test_ranking(self):
+        self.assertEqual(self.search(search_recipes, 'тыква'), [
+            self.by_name, self.by_ingredient, self.by_text,
+        ])
+        self.assertEqual(self.search(search_recipes, 'борщ'), [])
+
+    def test_fallback(self):
+        # Запасной поиск не зависит от СУБД и проверяется везде
+        for text in ('тыква', 'ТЫКВА', ' тык '):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(_search_in_process, text), [
+                    self.by_name, self.by_ingredient, self.by_text,
+                ])
+        self.assertEqual(self.search(_search_in_process, 'сладкая'), [
+            self.by_text,
+        ])
+        self.assertEqual(self.search(_search_in_process, 'борщ'), [])
+
+    def test_fallback_respects_queryset(self):
+        recipes = Recipe.objects.exclude(pk=self.by_name.pk)
+        self.assertEqual(list(_search_in_process(recipes, 'тыква')), [
+            self.by_ingredient, self.by_text,
+        ])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Нужен PostgreSQL.')
+    def test_gin_index(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Recipe._meta.db_table,
+            )
+        index = constraints['app_recipe_search_vector_gin']
+        self.assertEqual(index['columns'], ['search_vector'])
+        self.assertEqual(index['type'], 'gin')
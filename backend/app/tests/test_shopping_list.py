@@ -0,0 +1,180 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from app import shopping_list
+from app.models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+from api.tests.utils import (
+    create_ingredients,
+    create_recipe,
+    create_tags,
+    create_user,
+    get_client,
+)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class ShoppingListTestCase(TestCase):
+    """Рецепты, покупатель и проверка его списка покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(0)
+        cls.buyer = create_user(1)
+        cls.tags = create_tags(1)
+        cls.ingredients = create_ingredients(3)
+        cls.first = create_recipe(
+            cls.author, cls.tags, cls.ingredients[:2], name='Первый',
+        )
+        cls.second = create_recipe(
+            cls.author, cls.tags, cls.ingredients[1:], name='Второй',
+        )
+
+    def setUp(self):
+        self.client = get_client(self.buyer)
+
+    def get_items(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.buyer,
+        ).values_list('ingredient_id', 'amount'))
+
+    def assertItems(self, expected):
+        self.assertEqual(self.get_items(), {
+            self.ingredients[index].pk: amount
+            for index, amount in expected.items()
+        })
+        self.assertEqual(shopping_list.find_inconsistencies(), [])
+
+    def add(self, recipe):
+        response = self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+
+
+class ShoppingListTests(ShoppingListTestCase):
+    """Инкрементальное обновление списков покупок."""
+
+    def test_add_and_remove(self):
+        self.add(self.first)
+        self.assertItems({0: 10, 1: 10})
+        self.add(self.second)
+        self.assertItems({0: 10, 1: 20, 2: 10})
+        response = self.client.delete(
+            f'/api/recipes/{self.first.pk}/shopping_cart/',
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertItems({1: 10, 2: 10})
+
+    def test_recipe_edit(self):
+        self.add(self.first)
+        response = get_client(self.author).patch(
+            f'/api/recipes/{self.first.pk}/',
+            {
+                'tags': [self.tags[0].pk],
+                'ingredients': [
+                    {'id': self.ingredients[0].pk, 'amount': 5},
+                    {'id': self.ingredients[2].pk, 'amount': 7},
+                ],
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertItems({0: 5, 2: 7})
+
+    def test_recipe_delete(self):
+        self.add(self.first)
+        self.add(self.second)
+        response = get_client(self.author).delete(
+            f'/api/recipes/{self.first.pk}/',
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertItems({1: 10, 2: 10})
+
+    def test_check_and_rebuild_command(self):
+        self.add(self.first)
+        call_command('rebuild_shopping_lists', '--check', stdout=StringIO())
+        ShoppingListItem.objects.update(amount=1)
+        with self.assertRaisesMessage(CommandError, 'расхождений: 2'):
+            call_command(
+                'rebuild_shopping_lists', '--check', stdout=StringIO(),
+            )
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.assertItems({0: 10, 1: 10})
+
+
+class ShoppingListAdminTests(ShoppingListTestCase):
+    """Изменения корзин и рецептов из админки."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = create_user(2)
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        self.admin_client = self.client_class()
+        self.admin_client.force_login(self.admin)
+
+    def test_ingredient_in_recipe_change(self):
+        self.add(self.first)
+        item = IngredientInRecipe.objects.get(
+            recipe=self.first, ingredient=self.ingredients[0],
+        )
+        response = self.admin_client.post(
+            reverse('admin:app_ingredientinrecipe_change', args=(item.pk,)),
+            {'recipe': self.first.pk, 'ingredient': item.ingredient_id,
+             'amount': 3},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertItems({0: 3, 1: 10})
+        response = self.admin_client.post(
+            reverse('admin:app_ingredientinrecipe_delete', args=(item.pk,)),
+            {'post': 'yes'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertItems({1: 10})
+
+    def test_shopping_cart_add_and_delete(self):
+        response = self.admin_client.post(
+            reverse('admin:app_shoppingcart_add'),
+            {'user': self.buyer.pk, 'recipe': self.second.pk},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertItems({1: 10, 2: 10})
+        cart = ShoppingCart.objects.get(user=self.buyer)
+        response = self.admin_client.post(
+            reverse('admin:app_shoppingcart_change', args=(cart.pk,)),
+            {'user': self.buyer.pk, 'recipe': self.first.pk},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertItems({0: 10, 1: 10})
+        response = self.admin_client.post(
+            reverse('admin:app_shoppingcart_delete', args=(cart.pk,)),
+            {'post': 'yes'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertItems({})
+
+    def test_shopping_list_items_are_read_only(self):
+        self.add(self.first)
+        item = ShoppingListItem.objects.first()
+        self.assertEqual(
+            self.admin_client.get(
+                reverse('admin:app_shoppinglistitem_add'),
+            ).status_code,
+            403,
+        )
+        response = self.admin_client.post(
+            reverse('admin:app_shoppinglistitem_change', args=(item.pk,)),
+            {'user': self.buyer.pk, 'ingredient': item.ingredient_id,
+             'amount': 1},
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertItems({0: 10, 1: 10})
@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from app.versions import bump_version, get_version, get_versions
+
+
+class VersionsTests(TestCase):
+    """Версии ресурсов в кэше."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_version(self):
+        version = get_version('recipe', 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version('recipe', 1)
+        self.assertGreater(get_version('recipe', 1), version)
+        self.assertEqual(get_versions('recipe', (1,)), {
+            1: get_version('recipe', 1),
+        })
+
+    @override_settings(VERSION_CACHE_TIMEOUT=60)
+    def test_versions_expire(self):
+        with mock.patch('app.versions.cache', wraps=cache) as mocked:
+            get_version('tag')
+            get_versions('recipe', (1, 2))
+            cache.delete('version:tag')
+            with self.captureOnCommitCallbacks(execute=True):
+                bump_version('tag')
+        written = {
+            call.args[0]: call.kwargs['timeout']
+            for call in mocked.add.call_args_list + mocked.set.call_args_list
+        }
+        self.assertEqual(written, {
+            'version:tag': 60,
+            'version:recipe:1': 60,
+            'version:recipe:2': 60,
+        })
+        self.assertEqual(mocked.set.call_count, 1)
@@ -0,0 +1,137 @@
+from django.db import connection, transaction
+
+from app import counters, shopping_list
+from app.models import Favourite, Recipe, ShoppingCart
+from app.versions import bump_recipe_version, bump_version
+
+# Счётчик рецепта для каждого списка пользователя.
+LIST_COUNTERS = {
+    Favourite: 'favorites_count',
+    ShoppingCart: 'shopping_carts_count',
+}
+
+
+def _columns(model):
+    return (
+        connection.ops.quote_name(model._meta.db_table),
+        model._meta.get_field('user').column,
+        model._meta.get_field('recipe').column,
+    )
+
+
+def _count(model, sql, params, delta):
+    """
+    Выполняет изменяющий список запрос sql с RETURNING id рецепта
+    и в том же запросе меняет счётчик этих рецептов на delta.
+    UPDATE блокирует строки рецептов до конца транзакции, поэтому
+    отдельная блокировка для списка покупок не нужна.
+    """
+    recipe_table = connection.ops.quote_name(Recipe._meta.db_table)
+    recipe_pk = Recipe._meta.pk.column
+    recipe_column = model._meta.get_field('recipe').column
+    counter = LIST_COUNTERS[model]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH changed AS ({sql}) '
+            f'UPDATE {recipe_table} '
+            f'SET {counter} = GREATEST({counter} + %s, 0) '
+            f'WHERE {recipe_pk} IN (SELECT {recipe_column} FROM changed) '
+            f'RETURNING {recipe_pk}',
+            (*params, delta),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _insert(model, user_id, recipe_ids):
+    """
+    Добавляет в список существующие рецепты, которых в нём ещё нет,
+    и возвращает их id. На PostgreSQL это один запрос
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING, который
+    заодно увеличивает счётчик рецептов (см. _count).
+    """
+    if connection.vendor == 'postgresql':
+        table, user_column, recipe_column = _columns(model)
+        recipe_table = connection.ops.quote_name(Recipe._meta.db_table)
+        recipe_pk = Recipe._meta.pk.column
+        return _count(
+            model,
+            f'INSERT INTO {table} ({user_column}, {recipe_column}) '
+            f'SELECT %s, {recipe_pk} FROM {recipe_table} '
+            f'WHERE {recipe_pk} = ANY(%s) '
+            f'ON CONFLICT DO NOTHING RETURNING {recipe_column}',
+            (user_id, list(recipe_ids)),
+            1,
+        )
+    added = list(
+        Recipe.objects.filter(pk__in=recipe_ids).exclude(
+            pk__in=model.objects.filter(user_id=user_id).values('recipe_id'),
+        ).values_list('pk', flat=True)
+    )
+    model.objects.bulk_create(
+        (model(user_id=user_id, recipe_id=recipe_id) for recipe_id in added),
+        ignore_conflicts=True,
+    )
+    # bulk_create не отправляет сигналов, поэтому счётчик меняется здесь
+    counters.change_recipes_counter(added, LIST_COUNTERS[model], 1)
+    return added
+
+
+def _delete(model, user_id, recipe_ids):
+    """
+    Удаляет рецепты из списка и возвращает id удалённых. На PostgreSQL
+    это один запрос DELETE ... RETURNING, который заодно уменьшает
+    счётчик рецептов (см. _count).
+    """
+    if connection.vendor == 'postgresql':
+        table, user_column, recipe_column = _columns(model)
+        return _count(
+            model,
+            f'DELETE FROM {table} '
+            f'WHERE {user_column} = %s AND {recipe_column} = ANY(%s) '
+            f'RETURNING {recipe_column}',
+            (user_id, list(recipe_ids)),
+            -1,
+        )
+    items = model.objects.filter(user_id=user_id, recipe_id__in=recipe_ids)
+    removed = list(items.values_list('recipe_id', flat=True))
+    # Счётчик уменьшается сигналом post_delete (см. app.signals)
+    items.delete()
+    return removed
+
+
+def _apply(model, user_id, recipe_ids, sign):
+    if not recipe_ids:
+        return
+    # Запросы на PostgreSQL не отправляют сигналов моделей
+    bump_version('user-lists', user_id)
+    for recipe_id in recipe_ids:
+        bump_recipe_version(recipe_id, listing=False)
+    if model is ShoppingCart:
+        shopping_list.add_recipes(
+            user_id, recipe_ids, sign=sign,
+            locked=connection.vendor == 'postgresql',
+        )
+
+
+@transaction.atomic
+def add_recipes(model, user_id, recipe_ids):
+    """
+    Добавляет рецепты в избранное или корзину (model) пользователя,
+    обновляя счётчики рецептов и список покупок. Возвращает id
+    добавленных рецептов; уже добавленные и несуществующие
+    рецепты пропускаются.
+    """
+    added = _insert(model, user_id, set(recipe_ids))
+    _apply(model, user_id, added, 1)
+    return added
+
+
+@transaction.atomic
+def remove_recipes(model, user_id, recipe_ids):
+    """
+    Убирает рецепты из избранного или корзины (model) пользователя
+    и возвращает id убранных рецептов.
+    """
+    removed = _delete(model, user_id, set(recipe_ids))
+    _apply(model, user_id, removed, -1)
+    return removed
@@ -0,0 +1,6 @@
+def normalize(value):
+    """
+    Приводит текст к виду, по которому ведётся поиск в памяти
+    процесса: без учёта регистра, различия «е» и «ё» и лишних пробелов.
+    """
+    return ' '.join(value.casefold().replace('ё', 'е').split())
@@ -0,0 +1,87 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY_PREFIX = 'version'
+
+
+def _make_key(parts):
+    return ':'.join(str(part) for part in (VERSION_KEY_PREFIX, *parts))
+
+
+def _init(key, replace=False):
+    method = cache.set if replace else cache.add
+    method(key, time.time_ns(), timeout=settings.VERSION_CACHE_TIMEOUT)
+
+
+def get_version(*parts):
+    """
+    Возвращает текущую версию ресурса, например get_version('ingredient')
+    или get_version('recipe', pk).
+
+    Если версии ещё нет в кэше (или она была вытеснена либо истекла),
+    она инициализируется текущим временем в наносекундах, поэтому новая
+    версия никогда не совпадёт с выданной ранее. Версии живут
+    VERSION_CACHE_TIMEOUT секунд, чтобы ключи удалённых объектов
+    не копились в кэше.
+    """
+    key = _make_key(parts)
+    version = cache.get(key)
+    if version is None:
+        _init(key)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(name, pks):
+    """
+    Возвращает версии ресурсов name для нескольких pk
+    одним обращением к кэшу в виде словаря {pk: версия}.
+    """
+    keys = {_make_key((name, pk)): pk for pk in pks}
+    versions = cache.get_many(keys)
+    missing = keys.keys() - versions.keys()
+    if missing:
+        for key in missing:
+            _init(key)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        _init(key, replace=True)
+
+
+def bump_version(*parts):
+    """
+    Увеличивает версию ресурса после его изменения.
+
+    Внутри транзакции версия меняется только после коммита: иначе
+    параллельный GET между сменой версии и коммитом закэшировал бы
+    старые данные под новой версией, и они отдавались бы до следующей
+    записи. Вне транзакции версия меняется сразу.
+    """
+    key = _make_key(parts)
+    transaction.on_commit(lambda: _bump(key))
+
+
+def bump_recipe_version(recipe_id, listing=True):
+    """
+    Сбрасывает версию рецепта и счётчик изменений рецептов.
+
+    listing=True означает, что изменение может поменять состав
+    или порядок списков рецептов (создание, удаление, название,
+    описание, теги, ингредиенты); тогда сбрасывается и общая версия
+    списка рецептов. Остальные изменения (время приготовления,
+    изображение, счётчики) затрагивают только записи кэша списков,
+    в которые попал сам рецепт (см. api.cache).
+    """
+    bump_version('recipe', recipe_id)
+    bump_version('recipe-changes')
+    if listing:
+        bump_version('recipe')
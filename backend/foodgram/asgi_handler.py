@@ -0,0 +1,70 @@
+import django
+from django.core.handlers import asgi
+from django.http import StreamingHttpResponse
+
+
+class AsyncStreamingHttpResponse(StreamingHttpResponse):
+    """
+    Потоковый ответ, тело которого отдаёт асинхронный итератор
+    async_streaming_content (в Django 4.2 это умеет сам
+    StreamingHttpResponse). Отдаётся только ASGIHandler проекта.
+    """
+
+    def __init__(self, async_streaming_content, *args, **kwargs):
+        super().__init__((), *args, **kwargs)
+        self.async_streaming_content = async_streaming_content
+
+    async def aclose(self):
+        """Закрывает недочитанный итератор, например при обрыве связи."""
+        aclose = getattr(self.async_streaming_content, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    Обработчик ASGI проекта.
+
+    Запросы разбираются по urlconf с асинхронными вариантами
+    представлений, а тело AsyncStreamingHttpResponse отдаётся
+    асинхронно: Django 3.2 перебирает тело потокового ответа
+    синхронно прямо в цикле событий.
+    """
+
+    urlconf = 'foodgram.asgi_urls'
+
+    async def get_response_async(self, request):
+        request.urlconf = self.urlconf
+        return await super().get_response_async(request)
+
+    async def send_response(self, response, send):
+        if not isinstance(response, AsyncStreamingHttpResponse):
+            return await super().send_response(response, send)
+
+        async def send_with_body(message):
+            # Базовый метод отправляет заголовки, перебирает пустое
+            # синхронное тело и завершает ответ пустым сообщением;
+            # перед ним отправляется асинхронное тело.
+            if (
+                message['type'] == 'http.response.body'
+                and not message.get('more_body')
+            ):
+                async for part in response.async_streaming_content:
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+            await send(message)
+
+        try:
+            await super().send_response(response, send_with_body)
+        finally:
+            await response.aclose()
+
+
+def get_asgi_application():
+    """Как django.core.asgi.get_asgi_application, с ASGIHandler проекта."""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
@@ -0,0 +1,29 @@
+from django.urls import path
+
+from api.async_views import (
+    download_shopping_cart,
+    ingredient_list,
+    recipe_detail,
+    tag_list,
+)
+
+from foodgram.urls import urlpatterns as wsgi_urlpatterns
+
+# Под ASGI самые нагруженные на чтение адреса обслуживаются
+# асинхронными вариантами представлений, остальные - как под WSGI.
+# Выгрузка списка покупок отдаётся потоком из отдельного потока
+# запроса (см. api.async_views.stream_in_thread). Этот urlconf
+# подставляет foodgram.asgi_handler.ASGIHandler. Имена адресов
+# совпадают с именами из роутера api.urls, поэтому метрики
+# (foodgram.metrics) не зависят от сервера.
+urlpatterns = [
+    path('api/tags/', tag_list, name='tag-list'),
+    path('api/ingredients/', ingredient_list, name='ingredient-list'),
+    path(
+        'api/recipes/download_shopping_cart/',
+        download_shopping_cart,
+        name='recipe-download-shopping-cart',
+    ),
+    path('api/recipes/<int:pk>/', recipe_detail, name='recipe-detail'),
+    *wsgi_urlpatterns,
+]
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+_stats = {
+    'connections_opened': 0,
+    'connections_reused': 0,
+    'health_check_failures': 0,
+    'health_check_seconds': 0.0,
+    'connect_seconds': 0.0,
+    'acquisitions': 0,
+    'acquire_seconds': 0.0,
+}
+
+
+def _count(name, value=1):
+    with _lock:
+        _stats[name] += value
+
+
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    _count('connections_opened')
+
+
+class HealthCheckMixin:
+    """
+    Ленивая проверка постоянных соединений, как CONN_HEALTH_CHECKS
+    в Django 4.1.
+
+    Django закрывает просроченные по CONN_MAX_AGE и сломанные после
+    ошибок соединения в начале и в конце запроса. Оставшееся с прошлого
+    запроса соединение проверяется запросом SELECT 1 только при первом
+    обращении к базе в новом запросе, а не на каждый запрос для каждой
+    базы; разорванное соединение закрывается, и вместо него сразу
+    открывается новое. Время получения соединения (проверка
+    и подключение) учитывается в get_stats().
+    """
+
+    acquired = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # Вызывается в начале и в конце каждого запроса.
+        self.acquired = False
+
+    def connect(self):
+        started = time.monotonic()
+        super().connect()
+        _count('connect_seconds', time.monotonic() - started)
+
+    def _cursor(self, name=None):
+        if not self.acquired:
+            self.acquired = True
+            started = time.monotonic()
+            if self.connection is not None:
+                self.close_if_health_check_failed()
+            if self.connection is not None:
+                _count('connections_reused')
+            self.ensure_connection()
+            _count('acquisitions')
+            _count('acquire_seconds', time.monotonic() - started)
+        return super()._cursor(name)
+
+    def close_if_health_check_failed(self):
+        # Внутри транзакции соединение закрывать нельзя.
+        if not settings.DB_HEALTH_CHECKS or self.in_atomic_block:
+            return
+        started = time.monotonic()
+        usable = self.is_usable()
+        _count('health_check_seconds', time.monotonic() - started)
+        if not usable:
+            _count('health_check_failures')
+            self.close()
+
+
+def get_stats():
+    """
+    Статистика соединений текущего процесса: открытые и повторно
+    использованные соединения, неудачные проверки и время проверок,
+    время подключений, а также число и общее время получений
+    соединения при первом обращении к базе в запросе.
+    """
+    with _lock:
+        stats = dict(_stats)
+    for name in ('health_check_seconds', 'connect_seconds',
+                 'acquire_seconds'):
+        stats[name] = round(stats[name], 6)
+    stats['pid'] = os.getpid()
+    stats['open_connections'] = sum(
+        connection.connection is not None
+        for connection in connections.all()
+    )
+    return stats
@@ -0,0 +1,370 @@
+import asyncio
+import heapq
+import hmac
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+from api.cache import recipe_list_cache
+from foodgram.asgi_handler import AsyncStreamingHttpResponse
+from foodgram.db import get_stats
+
+logger = logging.getLogger('foodgram.slow_requests')
+
+# Границы корзин гистограммы длительности запросов, в секундах.
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Сколько самых долгих SQL-запросов попадает в журнал медленных запросов.
+SLOW_LOG_QUERIES = 5
+
+_current = ContextVar('request_metrics', default=None)
+_lock = threading.Lock()
+_endpoints = defaultdict(lambda: {
+    'buckets': [0] * len(DURATION_BUCKETS),
+    'count': 0,
+    'duration': 0.0,
+    'queries': 0,
+    'sql_duration': 0.0,
+    'response_bytes': 0,
+})
+_statuses = defaultdict(int)
+
+
+class RequestMetrics:
+    """SQL-запросы текущего HTTP-запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.slowest = []
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, duration):
+        with self._lock:
+            self.queries += 1
+            self.sql_duration += duration
+            item = (duration, self.queries, sql)
+            if len(self.slowest) < SLOW_LOG_QUERIES:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обёртка выполнения SQL (execute_wrapper). Запросы относятся
+    к текущему HTTP-запросу через contextvar, поэтому учитываются
+    и запросы из потоков sync_to_async под ASGI.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    # Соединения, открытые в потоках sync_to_async под ASGI
+    install_query_recorder(connection)
+
+
+def get_endpoint(request):
+    """
+    Метки запроса: имя адреса (для безымянных - путь к представлению),
+    действие ViewSet и метод.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved', '', request.method
+    actions = getattr(match.func, 'actions', None) or {}
+    return (
+        match.view_name,
+        actions.get(request.method.lower(), ''),
+        request.method,
+    )
+
+
+def _start_request():
+    for connection in connections.all():
+        install_query_recorder(connection)
+    return _current.set(RequestMetrics()), time.perf_counter()
+
+
+def _finish_request(request, response, state):
+    token, started = state
+    metrics = _current.get()
+    _current.reset(token)
+    if isinstance(response, AsyncStreamingHttpResponse):
+        response.async_streaming_content = measure_async_streaming(
+            response.async_streaming_content, request, response.status_code,
+            started, metrics,
+        )
+        return
+    if response is not None and response.streaming:
+        response.streaming_content = measure_streaming(
+            response.streaming_content, request, response.status_code,
+            started, metrics,
+        )
+        return
+    _record(
+        request,
+        response.status_code if response is not None else 500,
+        time.perf_counter() - started,
+        len(response.content) if response is not None else 0,
+        metrics,
+    )
+
+
+def measure_streaming(content, request, status, started, metrics):
+    """
+    Отдаёт потоковый ответ, считая его размер, и учитывает запрос,
+    когда сервер дочитает или закроет ответ: иначе время передачи
+    не попадало бы в длительность, а размер был бы нулевым. SQL-запросы,
+    выполненные при чтении (например, серверным курсором),
+    относятся к этому же запросу.
+    """
+    size = 0
+    iterator = iter(content)
+    try:
+        while True:
+            token = _current.set(metrics)
+            try:
+                chunk = next(iterator, None)
+            finally:
+                _current.reset(token)
+            if chunk is None:
+                break
+            size += len(chunk)
+            yield chunk
+    finally:
+        _record(
+            request, status, time.perf_counter() - started, size, metrics,
+        )
+
+
+async def measure_async_streaming(content, request, status, started,
+                                  metrics):
+    """
+    То же для асинхронного тела (см. foodgram.asgi_handler). SQL-запросы
+    при чтении выполняются в контексте запроса и учитываются сами.
+    """
+    size = 0
+    try:
+        async for chunk in content:
+            size += len(chunk)
+            yield chunk
+    finally:
+        aclose = getattr(content, 'aclose', None)
+        if aclose is not None:
+            await aclose()
+        _record(
+            request, status, time.perf_counter() - started, size, metrics,
+        )
+
+
+def _record(request, status, duration, size, metrics):
+    endpoint = get_endpoint(request)
+    with _lock:
+        data = _endpoints[endpoint]
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                data['buckets'][index] += 1
+        data['count'] += 1
+        data['duration'] += duration
+        data['queries'] += metrics.queries
+        data['sql_duration'] += metrics.sql_duration
+        data['response_bytes'] += size
+        _statuses[(*endpoint, status)] += 1
+    if duration >= settings.SLOW_REQUEST_SECONDS:
+        log_slow_request(request, duration, status, metrics)
+
+
+def log_slow_request(request, duration, status, metrics):
+    queries = '\n'.join(
+        f'  {query_duration * 1000:.1f} мс: {sql[:500]}'
+        for query_duration, _, sql in sorted(metrics.slowest, reverse=True)
+    )
+    logger.warning(
+        'Медленный запрос %s %s: %d, %.3f с, SQL: %d запросов, %.3f с\n%s',
+        request.method,
+        request.get_full_path(),
+        status,
+        duration,
+        metrics.queries,
+        metrics.sql_duration,
+        queries,
+    )
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """
+    Собирает по представлению и действию длительность запросов,
+    число и время SQL-запросов и размер ответов, а также пишет
+    в журнал запросы дольше SLOW_REQUEST_SECONDS.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            state = _start_request()
+            response = None
+            try:
+                response = await get_response(request)
+                return response
+            finally:
+                _finish_request(request, response, state)
+    else:
+        def middleware(request):
+            state = _start_request()
+            response = None
+            try:
+                response = get_response(request)
+                return response
+            finally:
+                _finish_request(request, response, state)
+    return middleware
+
+
+def escape_label(value):
+    """Экранирует значение метки по правилам текстового формата."""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def _labels(**labels):
+    return ','.join(
+        f'{name}="{escape_label(value)}"'
+        for name, value in labels.items()
+    )
+
+
+def render_metrics():
+    """
+    Метрики процесса в текстовом формате Prometheus. У каждого
+    воркера свои значения, они различаются меткой pid.
+    """
+    pid = os.getpid()
+    with _lock:
+        endpoints = {
+            key: {**data, 'buckets': list(data['buckets'])}
+            for key, data in _endpoints.items()
+        }
+        statuses = dict(_statuses)
+    lines = [
+        '# TYPE foodgram_http_request_duration_seconds histogram',
+    ]
+    for (view, action, method), data in sorted(endpoints.items()):
+        labels = _labels(pid=pid, view=view, action=action, method=method)
+        for bound, count in zip(DURATION_BUCKETS, data['buckets']):
+            lines.append(
+                f'foodgram_http_request_duration_seconds_bucket'
+                f'{{{labels},le="{bound}"}} {count}'
+            )
+        lines += [
+            f'foodgram_http_request_duration_seconds_bucket'
+            f'{{{labels},le="+Inf"}} {data["count"]}',
+            f'foodgram_http_request_duration_seconds_sum'
+            f'{{{labels}}} {data["duration"]:.6f}',
+            f'foodgram_http_request_duration_seconds_count'
+            f'{{{labels}}} {data["count"]}',
+        ]
+    for name, key, metric_type in (
+        ('foodgram_db_queries_total', 'queries', 'counter'),
+        ('foodgram_db_query_duration_seconds_total', 'sql_duration',
+         'counter'),
+        ('foodgram_http_response_bytes_total', 'response_bytes', 'counter'),
+    ):
+        lines.append(f'# TYPE {name} {metric_type}')
+        for (view, action, method), data in sorted(endpoints.items()):
+            labels = _labels(pid=pid, view=view, action=action, method=method)
+            lines.append(f'{name}{{{labels}}} {data[key]}')
+    lines.append('# TYPE foodgram_http_requests_total counter')
+    for (view, action, method, status), count in sorted(statuses.items()):
+        labels = _labels(
+            pid=pid, view=view, action=action, method=method, status=status,
+        )
+        lines.append(f'foodgram_http_requests_total{{{labels}}} {count}')
+    lines.append('# TYPE foodgram_recipe_list_cache_total counter')
+    for result, count in recipe_list_cache.stats().items():
+        lines.append(
+            f'foodgram_recipe_list_cache_total{{result="{result}"}} {count}'
+        )
+    db_stats = get_stats()
+    lines.append('# TYPE foodgram_db_connections_total counter')
+    for event in ('opened', 'reused'):
+        lines.append(
+            f'foodgram_db_connections_total{{{_labels(pid=pid, event=event)}}}'
+            f' {db_stats[f"connections_{event}"]}'
+        )
+    lines += [
+        '# TYPE foodgram_db_health_check_failures_total counter',
+        f'foodgram_db_health_check_failures_total{{{_labels(pid=pid)}}} '
+        f'{db_stats["health_check_failures"]}',
+        '# TYPE foodgram_db_connection_acquisitions_total counter',
+        f'foodgram_db_connection_acquisitions_total{{{_labels(pid=pid)}}} '
+        f'{db_stats["acquisitions"]}',
+        '# TYPE foodgram_db_connection_acquire_seconds_total counter',
+        f'foodgram_db_connection_acquire_seconds_total{{{_labels(pid=pid)}}} '
+        f'{db_stats["acquire_seconds"]}',
+        '# TYPE foodgram_db_connect_seconds_total counter',
+        f'foodgram_db_connect_seconds_total{{{_labels(pid=pid)}}} '
+        f'{db_stats["connect_seconds"]}',
+        '# TYPE foodgram_db_open_connections gauge',
+        f'foodgram_db_open_connections{{{_labels(pid=pid)}}} '
+        f'{db_stats["open_connections"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def has_metrics_access(request):
+    """
+    Доступ по токену METRICS_TOKEN (заголовок Authorization: Bearer)
+    или для сотрудников, вошедших через админку.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if hmac.compare_digest(
+            request.headers.get('Authorization', '').encode(),
+            expected.encode(),
+        ):
+            return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def metrics_view(request):
+    """
+    Служебный адрес для Prometheus. Находится вне /api/ и не
+    проксируется nginx; кроме того, требует токена или прав
+    сотрудника (см. has_metrics_access).
+    """
+    if not has_metrics_access(request):
+        raise PermissionDenied
+    return HttpResponse(
+        render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
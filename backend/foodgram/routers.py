@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Разрешено ли текущему запросу читать с реплик. Вне запросов
+# (команды, фоновые потоки) чтение всегда идёт с основной базы.
+_use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Чтение внутри блока идёт с основной базы.
+
+    Нужно везде, где прочитанные данные сохраняются под текущими
+    версиями ресурсов (app.versions): кэш ответов, ETag, индекс
+    ингредиентов. Версия сбрасывается сразу после коммита на основной
+    базе, и отстающая реплика сохранила бы под новой версией старые
+    данные, которые отдавались бы до следующего изменения.
+    """
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def get_client_key(request):
+    """
+    Ключ клиента для привязки к основной базе: хэш заголовка
+    Authorization или сессионной cookie. Анонимным клиентам
+    привязка не нужна.
+    """
+    credentials = request.META.get('HTTP_AUTHORIZATION') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    digest = hashlib.md5(credentials.encode()).hexdigest()
+    return f'db-sticky:{digest}'
+
+
+def _start_request(request):
+    key = get_client_key(request)
+    safe = request.method in SAFE_METHODS
+    token = _use_replica.set(safe and not (key and cache.get(key)))
+    return token, key, safe
+
+
+def _finish_request(token, key, safe):
+    _use_replica.reset(token)
+    if not safe and key:
+        cache.set(key, True, settings.DATABASE_STICKY_SECONDS)
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    """
+    Разрешает чтение с реплик для безопасных запросов. После
+    изменяющего запроса клиент на DATABASE_STICKY_SECONDS
+    привязывается к основной базе, чтобы видеть свои изменения.
+
+    Работает и под WSGI, и под ASGI, не переключая поток.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not settings.DATABASE_REPLICAS:
+                return await get_response(request)
+            state = _start_request(request)
+            try:
+                return await get_response(request)
+            finally:
+                _finish_request(*state)
+    else:
+        def middleware(request):
+            if not settings.DATABASE_REPLICAS:
+                return get_response(request)
+            state = _start_request(request)
+            try:
+                return get_response(request)
+            finally:
+                _finish_request(*state)
+    return middleware
+
+
+class PrimaryReplicaRouter:
+    """
+    Направляет чтение на случайную реплику из DATABASE_REPLICAS,
+    если это разрешено текущему запросу, а запись и миграции -
+    на основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICAS
+            and _use_replica.get()
+            and not connections['default'].in_atomic_block
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -33,7 +33,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.routers.replica_routing_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,15 +66,74 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # django.db.backends.postgresql с проверкой соединений
+        # (см. foodgram.db.HealthCheckMixin).
+        'ENGINE': 'foodgram.backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Постоянные соединения: время жизни в секундах, 0 - закрывать
+        # после каждого запроса.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # Для пулеров в режиме transaction pooling (PgBouncer).
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', 'false',
+        ).lower() in ('1', 'true', 'yes'),
     }
 }
 
+# Проверять постоянные соединения при первом обращении к базе
+# в запросе (см. foodgram.db).
+DB_HEALTH_CHECKS = os.getenv(
+    'DB_HEALTH_CHECKS', 'true',
+).lower() in ('1', 'true', 'yes')
+
+# Реплики для чтения: хосты через запятую в DB_REPLICA_HOSTS.
+# В тестах реплики отражают основную базу (TEST MIRROR).
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, (
+    host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',')
+))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['foodgram.routers.PrimaryReplicaRouter']
+
+# Сколько секунд после записи клиент читает с основной базы.
+DATABASE_STICKY_SECONDS = int(os.getenv('DATABASE_STICKY_SECONDS', 5))
+
+
+# Версии ресурсов (app.versions), кэш ответов и токенов должны быть
+# общими для всех воркеров, поэтому в docker-compose задаётся REDIS_URL.
+# LocMemCache годится только для разработки с одним процессом
+# (см. app.checks).
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': os.getenv(
+                'CACHE_BACKEND',
+                'django.core.cache.backends.locmem.LocMemCache',
+            ),
+            'LOCATION': os.getenv('CACHE_LOCATION', ''),
+        }
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -94,6 +155,26 @@ ROOT_URLCONF = 'foodgram.urls'
 
 LOAD_DATA_DIR = os.path.join(BASE_DIR, 'data')
 
+RECIPES_LIMIT_MAX = int(os.getenv('RECIPES_LIMIT_MAX', 50))
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 20))
+
+RECIPE_BATCH_MAX = int(os.getenv('RECIPE_BATCH_MAX', 100))
+
+# Кэш токенов аутентификации: размер и время жизни (с) в памяти
+# процесса, время жизни (с) в общем кэше.
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 10))
+AUTH_TOKEN_SHARED_CACHE_TTL = int(
+    os.getenv('AUTH_TOKEN_SHARED_CACHE_TTL', 300),
+)
+
+RECIPE_LIST_CACHE_TIMEOUT = int(os.getenv('RECIPE_LIST_CACHE_TIMEOUT', 300))
+
+# Время жизни (с) версий ресурсов в кэше (см. app.versions); должно
+# быть заметно больше времени жизни кэшей ответов.
+VERSION_CACHE_TIMEOUT = int(os.getenv('VERSION_CACHE_TIMEOUT', 86400))
+
 LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
@@ -110,9 +191,38 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+# Ширина уменьшенных копий изображений рецептов.
+RECIPE_IMAGE_VARIANTS = {
+    'card': 480,
+    'detail': 960,
+    'retina': 1920,
+}
 
-ROOT_URLCONF = 'foodgram.urls'
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+# Запросы дольше этого времени (с) пишутся в журнал
+# foodgram.slow_requests вместе с самыми долгими SQL-запросами.
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', 1))
+
+# Токен для /internal/metrics/ (заголовок Authorization: Bearer <токен>).
+# Без него метрики доступны только сотрудникам (is_staff).
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.slow_requests': {
+            'handlers': ('console',),
+            'level': 'WARNING',
+        },
+    },
+}
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DJOSER = {
     'LOGIN_FIELD': 'email',
@@ -131,7 +241,7 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
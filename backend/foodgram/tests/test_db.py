@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase
+
+from foodgram.db import HealthCheckMixin, get_stats
+
+
+class HealthCheckTests(SimpleTestCase):
+    """Ленивая проверка постоянных соединений."""
+
+    def setUp(self):
+        default = connections[DEFAULT_DB_ALIAS]
+        wrapper = type(default)
+        if not issubclass(wrapper, HealthCheckMixin):
+            wrapper = type('DatabaseWrapper', (HealthCheckMixin, wrapper), {})
+        self.connection = wrapper(
+            {**default.settings_dict, 'CONN_MAX_AGE': None},
+            alias=DEFAULT_DB_ALIAS,
+        )
+        self.addCleanup(self.connection.close)
+
+    def query(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def start_request(self):
+        self.connection.close_if_unusable_or_obsolete()
+
+    def test_checked_once_per_request(self):
+        self.query()
+        with mock.patch.object(
+            self.connection, 'is_usable', return_value=True,
+        ) as is_usable:
+            self.query()
+            self.assertEqual(is_usable.call_count, 0)
+            self.start_request()
+            self.assertEqual(is_usable.call_count, 0)
+            self.query()
+            self.query()
+            self.assertEqual(is_usable.call_count, 1)
+
+    def test_broken_connection_is_replaced(self):
+        self.query()
+        self.start_request()
+        before = get_stats()
+        with mock.patch.object(
+            self.connection, 'is_usable', return_value=False,
+        ), mock.patch.object(
+            self.connection, 'close', wraps=self.connection.close,
+        ) as close:
+            self.query()
+        close.assert_called_once()
+        self.assertEqual(
+            get_stats()['health_check_failures'],
+            before['health_check_failures'] + 1,
+        )
+
+    def test_new_connection_is_not_checked(self):
+        self.start_request()
+        before = get_stats()
+        with mock.patch.object(self.connection, 'is_usable') as is_usable:
+            self.query()
+        is_usable.assert_not_called()
+        after = get_stats()
+        self.assertEqual(after['acquisitions'], before['acquisitions'] + 1)
+        self.assertEqual(
+            after['connections_reused'], before['connections_reused'],
+        )
@@ -0,0 +1,93 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve
+
+from api.tests.utils import create_user
+
+from foodgram import metrics
+
+
+class MetricsViewAccessTests(TestCase):
+    """Доступ к /internal/metrics/."""
+
+    URL = '/internal/metrics/'
+
+    def test_anonymous_is_forbidden(self):
+        self.assertEqual(self.client.get(self.URL).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        for header, status in (
+            ('Bearer secret', 200),
+            ('Bearer wrong', 403),
+            ('secret', 403),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    self.URL, HTTP_AUTHORIZATION=header,
+                )
+                self.assertEqual(response.status_code, status)
+
+    def test_staff(self):
+        user = create_user(0)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(self.URL).status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.client.get(self.URL).status_code, 200)
+
+
+class MetricsTests(TestCase):
+    """Сбор и вывод метрик."""
+
+    def call(self, response):
+        request = RequestFactory().get('/')
+        return metrics.metrics_middleware(lambda request: response)(request)
+
+    def get_endpoint(self):
+        return dict(metrics._endpoints[('unresolved', '', 'GET')])
+
+    def test_endpoint_labels(self):
+        factory = RequestFactory()
+        self.assertEqual(
+            metrics.get_endpoint(factory.get('/api/recipes/1/')),
+            ('unresolved', '', 'GET'),
+        )
+        cases = (
+            (factory.get('/api/recipes/1/'),
+             ('recipe-detail', 'retrieve', 'GET')),
+            (factory.post('/api/recipes/1/favorite/'),
+             ('recipe-add-to-favorite', 'add_to_favorite', 'POST')),
+        )
+        for urlconf in ('foodgram.urls', 'foodgram.asgi_urls'):
+            for request, expected in cases:
+                with self.subTest(urlconf=urlconf, path=request.path):
+                    request.resolver_match = resolve(request.path, urlconf)
+                    self.assertEqual(metrics.get_endpoint(request), expected)
+
+    def test_labels_are_escaped(self):
+        self.assertEqual(
+            metrics._labels(view='a\\b"c\nd'),
+            'view="a\\\\b\\"c\\nd"',
+        )
+
+    def test_response_size(self):
+        before = self.get_endpoint()
+        self.call(HttpResponse(b'12345'))
+        after = self.get_endpoint()
+        self.assertEqual(after['count'], before['count'] + 1)
+        self.assertEqual(
+            after['response_bytes'], before['response_bytes'] + 5,
+        )
+
+    def test_streaming_response_recorded_when_consumed(self):
+        before = self.get_endpoint()
+        response = self.call(StreamingHttpResponse(iter([b'123', b'45'])))
+        self.assertEqual(self.get_endpoint()['count'], before['count'])
+        self.assertEqual(b''.join(response.streaming_content), b'12345')
+        response.close()
+        after = self.get_endpoint()
+        self.assertEqual(after['count'], before['count'] + 1)
+        self.assertEqual(
+            after['response_bytes'], before['response_bytes'] + 5,
+        )
@@ -0,0 +1,170 @@
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+
+from app.models import Recipe
+from api.tests.utils import (
+    create_ingredients,
+    create_recipe,
+    create_tags,
+    create_user,
+    get_client,
+)
+from foodgram.routers import (
+    PrimaryReplicaRouter,
+    primary_reads,
+    replica_routing_middleware,
+)
+
+REPLICA = 'replica_0'
+HAS_REPLICA = REPLICA in settings.DATABASES
+
+
+def read_alias(request):
+    """Представление, которое возвращает базу для чтения рецептов."""
+    return HttpResponse(PrimaryReplicaRouter().db_for_read(Recipe))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], DATABASE_STICKY_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Выбор базы для чтения в запросах и привязка к основной базе."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = replica_routing_middleware(read_alias)
+
+    def request(self, method='get', token=None, view=None):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        request = getattr(self.factory, method)('/api/recipes/', **headers)
+        middleware = self.middleware
+        if view is not None:
+            middleware = replica_routing_middleware(view)
+        return middleware(request).content.decode()
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(Recipe), 'default')
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.request(), REPLICA)
+        self.assertEqual(self.request(token='first'), REPLICA)
+
+    def test_unsafe_requests_read_from_primary(self):
+        self.assertEqual(self.request('post', token='first'), 'default')
+
+    def test_writes_use_primary(self):
+        self.assertEqual(
+            self.request(view=lambda request: HttpResponse(
+                PrimaryReplicaRouter().db_for_write(Recipe),
+            )),
+            'default',
+        )
+
+    def test_client_sticks_to_primary_after_write(self):
+        self.request('post', token='first')
+        self.assertEqual(self.request(token='first'), 'default')
+        self.assertEqual(self.request(token='second'), REPLICA)
+        self.assertEqual(self.request(), REPLICA)
+
+    def test_stickiness_expires(self):
+        with override_settings(DATABASE_STICKY_SECONDS=-1):
+            self.request('post', token='first')
+        self.assertEqual(self.request(token='first'), REPLICA)
+
+    def test_primary_reads_block_uses_primary(self):
+        def view(request):
+            with primary_reads():
+                return read_alias(request)
+
+        self.assertEqual(self.request(view=view), 'default')
+        self.assertEqual(self.request(), REPLICA)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas_reads_use_primary(self):
+        self.assertEqual(self.request(), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingInTransactionTests(TestCase):
+    """Внутри транзакции чтение идёт с основной базы."""
+
+    def test_reads_in_atomic_block_use_primary(self):
+        def view(request):
+            with transaction.atomic():
+                return read_alias(request)
+
+        request = RequestFactory().get('/api/recipes/')
+        response = replica_routing_middleware(view)(request)
+        self.assertEqual(response.content.decode(), 'default')
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@skipUnless(HAS_REPLICA, 'Нужна реплика-зеркало: задайте DB_REPLICA_HOSTS.')
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class ReplicaQueriesTests(TransactionTestCase):
+    """
+    Запросы к двум алиасам одной базы: реплика в тестах — зеркало
+    основной базы (TEST MIRROR), поэтому данные видны обеим.
+    """
+
+    # Тестовый раннер создаёт базы для всех алиасов из databases,
+    # даже если тесты пропускаются.
+    databases = {'default', REPLICA} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(0)
+        self.recipe = create_recipe(
+            self.user, create_tags(1), create_ingredients(2),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections[REPLICA]) as replica:
+                response = request()
+        self.assertLess(response.status_code, 300)
+        return len(primary), len(replica)
+
+    def test_reads_go_to_replica_until_client_writes(self):
+        client = get_client(self.user)
+        primary, replica = self.count_queries(
+            lambda: client.get('/api/recipes/', {'is_favorited': 1}),
+        )
+        self.assertGreater(replica, 0)
+        self.count_queries(
+            lambda: client.post(f'/api/recipes/{self.recipe.pk}/favorite/'),
+        )
+        primary, replica = self.count_queries(
+            lambda: client.get('/api/recipes/', {'is_favorited': 1}),
+        )
+        self.assertEqual(replica, 0)
+
+    def test_cached_responses_are_built_from_primary(self):
+        client = get_client()
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipe.pk}/'):
+            with self.subTest(url=url):
+                primary, replica = self.count_queries(
+                    lambda: client.get(url),
+                )
+                self.assertGreater(primary, 0)
+                self.assertEqual(replica, 0)
@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from foodgram.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
+    path('internal/metrics/', metrics_view),
 ]
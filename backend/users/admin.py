@@ -15,5 +15,8 @@ class CustomUser(UserAdmin):
         'email',  # Электронная почта пользователя (добавленное поле)
         'first_name',  # Имя пользователя
         'last_name',  # Фамилия пользователя
+        'recipes_count',  # Количество рецептов
+        'followers_count',  # Количество подписчиков
     )
-    list_filter = ('email', 'username')  # Фильтры списка пользователей
+    # Фильтры с ограниченным набором значений
+    list_filter = ('is_staff', 'is_active')
@@ -9,11 +9,21 @@ class User(AbstractUser):
     EMAIL_FIELD = 'email'
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    # Меняются только атомарно (см. app.counters).
+    COUNTER_FIELDS = ('recipes_count', 'followers_count')
+    # Выводятся в профиле автора рецепта.
+    PROFILE_FIELDS = ('username', 'first_name', 'last_name', 'email')
 
     first_name = models.CharField(_('first name'), max_length=50)
     last_name = models.CharField(_('last name'), max_length=50)
     email = models.EmailField(_('email address'), max_length=100, unique=True)
     password = models.CharField(_('password'), max_length=128)
+    recipes_count = models.PositiveIntegerField(
+        _('recipes count'), default=0, editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        _('followers count'), default=0, editable=False,
+    )
 
     groups = models.ManyToManyField(
         to='auth.Group',
@@ -35,3 +45,45 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    def save(self, *args, **kwargs):
+        """
+        Обычное сохранение существующего пользователя не записывает
+        счётчики: объект мог устареть (например, взят из кэша токенов),
+        и его значения затёрли бы обновлённые через F(). Записать их
+        можно, только явно перечислив в update_fields.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_profile = self._get_profile()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_profile = instance._get_profile()
+        return instance
+
+    def _get_profile(self):
+        return {
+            name: self.__dict__[name]
+            for name in self.PROFILE_FIELDS
+            if name in self.__dict__
+        }
+
+    def get_changed_profile_fields(self):
+        """
+        Возвращает поля из PROFILE_FIELDS, изменённые с момента
+        загрузки пользователя из базы или последнего сохранения.
+        """
+        loaded = getattr(self, '_loaded_profile', {})
+        return {
+            name
+            for name, value in self._get_profile().items()
+            if name not in loaded or loaded[name] != value
+        }